@@ -20,11 +20,10 @@ from pathlib import Path
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-# 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from parallel_batch_processor import configure_logging
+
+# 设置日志（队列日志：控制台和文件写入由后台线程完成）
+configure_logging()
 logger = logging.getLogger(__name__)
 
 def main():
@@ -72,8 +71,23 @@ def main():
                        help="视频级并发数 (默认: 3，建议不超过3)")
     parser.add_argument("-w", "--ffmpeg-workers", 
                        type=int, 
-                       default=4,
-                       help="FFmpeg并行线程数 (默认: 4，建议2-8)")
+                       default=0,
+                       help="FFmpeg并行进程数 (默认: 0，按CPU核心数自动计算)")
+    parser.add_argument("--workers", 
+                       type=int, 
+                       default=0,
+                       help="视频级工作进程数 (默认: 0，使用线程；上限为CPU核心数)")
+    parser.add_argument("--no-cache", 
+                       action="store_true",
+                       help="忽略已缓存的视频分析结果，重新调用API")
+    parser.add_argument("--concat-short", 
+                       type=float, 
+                       default=0,
+                       help="短于该秒数的视频合并后一次提交分析 (默认: 0，不合并；要求编码参数一致)")
+    parser.add_argument("--min-shot-duration", 
+                       type=float, 
+                       default=0,
+                       help="短于该秒数的镜头并入相邻镜头 (默认: 0，不合并；会改变切片边界和数量)")
     
     # 文件过滤参数
     parser.add_argument("--patterns", 
@@ -105,7 +119,9 @@ def main():
         print(f"📂 输出目录: {args.output}")
         print(f"🎯 分析功能: {', '.join(args.features)}")
         print(f"🚀 视频并发数: {args.concurrent}")
-        print(f"⚡ FFmpeg线程数: {args.ffmpeg_workers}")
+        print(f"⚡ FFmpeg进程数: {args.ffmpeg_workers or '自动'}")
+        if args.workers > 0:
+            print(f"🧩 工作进程数: {args.workers}")
         print(f"📄 文件模式: {', '.join(args.patterns)}")
         print("=" * 60)
     
@@ -137,7 +153,11 @@ def main():
             output_dir=args.output,
             temp_dir=args.temp,
             max_concurrent=args.concurrent,
-            ffmpeg_workers=args.ffmpeg_workers
+            ffmpeg_workers=args.ffmpeg_workers,
+            workers=args.workers,
+            use_cache=not args.no_cache,
+            concat_short_seconds=args.concat_short,
+            min_shot_duration=args.min_shot_duration
         )
         
         # 执行处理
@@ -6,24 +6,60 @@ Google Cloud Video Intelligence API 分析器 - 独立版本
 
 import os
 import time
+import asyncio
+import concurrent.futures
+import contextlib
+import datetime
+import functools
+import itertools
 import logging
 import json
+import mimetypes
+import queue
+import random
+import threading
 import uuid
 from typing import Dict, Any, List, Tuple, Optional
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Video Intelligence gRPC通道参数：放宽消息大小上限（标签/镜头结果可能很大），
+# 开启keepalive保持批处理期间的长连接
+GRPC_CHANNEL_OPTIONS = [
+    ("grpc.max_send_message_length", 64 << 20),
+    ("grpc.max_receive_message_length", 64 << 20),
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.use_local_subchannel_pool", 1),
+]
+
+# 单个视频分析请求遇到暂时性错误时的最大尝试次数
+ANALYSIS_ATTEMPTS = 3
+
+# 进程内共享的分析器实例（见get_analyzer）
+_ANALYZER: Optional["GoogleVideoAnalyzer"] = None
+_ANALYZER_PID: Optional[int] = None
+_ANALYZER_LOCK = threading.Lock()
+
 
 class GoogleVideoAnalyzer:
     """Google Cloud Video Intelligence API 分析器"""
 
-    def __init__(self, credentials_path: Optional[str] = None):
+    # 已确认存在的存储桶（进程内共享），避免每次分析都发送exists()请求
+    _bucket_cache: Dict[str, Any] = {}
+    _bucket_lock = threading.Lock()
+
+    def __init__(self, credentials_path: Optional[str] = None, max_concurrent_parts: int = 4,
+                 upload_part_size: int = 64 * 1024 * 1024, async_channels: int = 1):
         """
         初始化Google Cloud分析器
 
         Args:
             credentials_path: Google Cloud凭据文件路径
+            max_concurrent_parts: 分片上传的并发线程数（默认4）
+            upload_part_size: 分片上传的分片大小（字节，默认64MB，最小5MB）
+            async_channels: 异步分析使用的gRPC通道数（默认1），并发请求轮流使用
         """
         # 凭据文件路径优先级
         if credentials_path:
@@ -37,33 +73,68 @@ class GoogleVideoAnalyzer:
         self.storage_client = None
         self.project_id = None
 
+        # 大文件分片并发上传配置
+        self.max_concurrent_parts = max(1, max_concurrent_parts)
+        self.upload_part_size = max(5 * 1024 * 1024, upload_part_size)
+
+        # 异步客户端池绑定到创建它的事件循环，按需惰性创建，请求间轮流使用
+        self.async_channels = max(1, async_channels)
+        self._async_clients: List[Any] = []
+        self._async_client_cycle = None
+        self._async_client_loop = None
+
+        # 进度事件队列：由独立线程调用进度回调，分析线程不被UI更新阻塞
+        self._progress_queue = queue.SimpleQueue()
+        threading.Thread(target=self._progress_pump, name="gvi-progress-pump", daemon=True).start()
+
         # 设置环境变量
         if self.credentials_path and os.path.exists(self.credentials_path):
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(os.path.abspath(self.credentials_path))
             logger.info(f"使用Google Cloud凭据: {self.credentials_path}")
 
             # 获取项目ID
-            try:
-                with open(self.credentials_path, 'r', encoding='utf-8') as f:
-                    cred_data = json.load(f)
-                    self.project_id = cred_data.get('project_id')
-                    logger.info(f"项目ID: {self.project_id}")
-            except Exception as e:
-                logger.warning(f"无法读取项目ID: {e}")
+            if self._cred_data is not None:
+                self.project_id = self._cred_data.get('project_id')
+                logger.info(f"项目ID: {self.project_id}")
         else:
             logger.warning(f"Google Cloud凭据文件不存在: {self.credentials_path}")
 
         self._initialize_clients()
 
+    @functools.cached_property
+    def _cred_data(self) -> Optional[Dict[str, Any]]:
+        """
+        凭据文件内容（首次访问时解析，之后复用）
+
+        凭据文件轮换后需要重新创建分析器实例才能生效。
+        """
+        try:
+            with open(self.credentials_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"无法读取凭据文件: {e}")
+            return None
+
     def _initialize_clients(self):
         """初始化Google Cloud客户端"""
         try:
             from google.cloud import videointelligence_v1 as vi
             from google.cloud import storage
 
-            self.client = vi.VideoIntelligenceServiceClient()
+            from google.cloud.videointelligence_v1.services.video_intelligence_service.transports import (
+                VideoIntelligenceServiceGrpcTransport,
+            )
+
+            # 显式创建gRPC通道以应用调优参数，整个批处理复用同一通道
+            channel = VideoIntelligenceServiceGrpcTransport.create_channel(
+                options=GRPC_CHANNEL_OPTIONS
+            )
+            self.client = vi.VideoIntelligenceServiceClient(
+                transport=VideoIntelligenceServiceGrpcTransport(channel=channel)
+            )
             self.storage_client = storage.Client()
             logger.info("Google Cloud客户端初始化成功")
+            self._warm_up_connections()
         except Exception as e:
             logger.error(f"Google Cloud客户端初始化失败: {str(e)}")
             self.client = None
@@ -72,22 +143,19 @@ class GoogleVideoAnalyzer:
     def check_credentials(self) -> Tuple[bool, Optional[str]]:
         """检查Google Cloud凭据是否有效"""
         if self.credentials_path and os.path.exists(self.credentials_path):
-            try:
-                # 验证JSON文件格式
-                import json
-                with open(self.credentials_path, 'r', encoding='utf-8') as f:
-                    cred_data = json.load(f)
-
-                # 检查必要字段
-                required_fields = ['type', 'project_id', 'private_key', 'client_email']
-                if all(field in cred_data for field in required_fields):
-                    logger.info(f"Google Cloud凭据有效，项目ID: {cred_data.get('project_id', 'Unknown')}")
-                    return True, self.credentials_path
-                else:
-                    logger.error("Google Cloud凭据文件缺少必要字段")
-                    return False, None
-            except Exception as e:
-                logger.error(f"Google Cloud凭据文件验证失败: {str(e)}")
+            # 使用初始化时解析的凭据内容
+            cred_data = self._cred_data
+            if cred_data is None:
+                logger.error("Google Cloud凭据文件验证失败: 无法解析JSON")
+                return False, None
+
+            # 检查必要字段
+            required_fields = ['type', 'project_id', 'private_key', 'client_email']
+            if all(field in cred_data for field in required_fields):
+                logger.info(f"Google Cloud凭据有效，项目ID: {cred_data.get('project_id', 'Unknown')}")
+                return True, self.credentials_path
+            else:
+                logger.error("Google Cloud凭据文件缺少必要字段")
                 return False, None
         else:
             logger.warning(f"Google Cloud凭据文件不存在: {self.credentials_path}")
@@ -109,143 +177,38 @@ class GoogleVideoAnalyzer:
             video_path: 本地视频文件路径
             video_uri: 云端视频URI（如gs://bucket/video.mp4）
             features: 要分析的功能列表
-            progress_callback: 进度回调函数
+            progress_callback: 进度回调函数（在独立线程中按顺序调用）
             auto_cleanup_storage: 是否在分析完成后自动删除上传的文件
             bucket_name: Cloud Storage桶名（如果不提供会使用默认的video-slice-bucket）
 
         Returns:
             分析结果字典
         """
-        if not self.client:
-            raise Exception("Google Cloud客户端未初始化")
-
-        # 检查网络连接
         if progress_callback:
-            progress_callback(5, "检查网络连接和服务可用性...")
-
-        try:
-            import requests
-            # 检查基本网络连接
-            requests.get("https://www.google.com", timeout=5)
+            progress_callback = self._queued_callback(progress_callback)
 
-            # 快速检查Google Cloud服务可用性
-            response = requests.get("https://videointelligence.googleapis.com", timeout=10)
-            logger.info("Google Cloud Video Intelligence服务连接正常")
-        except Exception as e:
-            error_msg = f"无法连接到Google Cloud服务，请检查网络连接: {str(e)}"
-            logger.error(error_msg)
-            return {"success": False, "error": error_msg}
+        if not self.client:
+            raise Exception("Google Cloud客户端未初始化")
 
         uploaded_blob_name = None  # 记录上传的文件名，用于后续删除
         bucket = None
 
         try:
-            from google.cloud import videointelligence_v1 as vi
-
             # 默认功能 - 只使用镜头检测以提升性能
             if not features:
                 features = ["shot_detection"]
 
-            # 转换功能名称为API枚举
-            feature_map = {
-                "shot_detection": vi.Feature.SHOT_CHANGE_DETECTION,
-                "label_detection": vi.Feature.LABEL_DETECTION,
-                "text_detection": vi.Feature.TEXT_DETECTION,
-                "face_detection": vi.Feature.FACE_DETECTION,
-                "object_tracking": vi.Feature.OBJECT_TRACKING
-            }
-
-            api_features = [feature_map[f] for f in features if f in feature_map]
-
-            # 构建请求
-            if video_path and os.path.exists(video_path):
-                # 检查文件大小
-                file_size = os.path.getsize(video_path)
-                file_size_mb = file_size / (1024 * 1024)
-
-                if progress_callback:
-                    progress_callback(15, f"准备处理视频文件 ({file_size_mb:.1f}MB)...")
-
-                # 大文件警告
-                if file_size_mb > 200:
-                    logger.warning(f"视频文件较大 ({file_size_mb:.1f}MB)，分析可能需要较长时间")
-                    if progress_callback:
-                        progress_callback(20, f"视频文件较大 ({file_size_mb:.1f}MB)，预计需要5-15分钟...")
-                elif file_size_mb > 50:
-                    if progress_callback:
-                        progress_callback(20, f"视频文件大小适中 ({file_size_mb:.1f}MB)，预计需要2-5分钟...")
-                else:
-                    if progress_callback:
-                        progress_callback(20, f"视频文件较小 ({file_size_mb:.1f}MB)，预计1-2分钟完成...")
-
-                # 如果需要自动清理，或者文件较大，则上传到Cloud Storage
-                if auto_cleanup_storage or file_size_mb > 50:
-                    if progress_callback:
-                        progress_callback(22, "上传视频到Cloud Storage...")
-                    
-                    # 准备Cloud Storage桶
-                    if not bucket_name:
-                        bucket_name = "video-slice-bucket"
-                    
-                    bucket = self._ensure_bucket_exists(bucket_name)
-                    if not bucket:
-                        raise Exception(f"无法创建或访问存储桶: {bucket_name}")
-                    
-                    # 生成唯一的云端文件名
-                    import time
-                    timestamp = int(time.time())
-                    file_name = f"slice_analysis_{timestamp}_{uuid.uuid4().hex[:8]}_{Path(video_path).name}"
-                    uploaded_blob_name = f"video-analysis/{file_name}"
-                    
-                    # 上传文件到Cloud Storage
-                    gs_uri = self._upload_to_cloud_storage(bucket, video_path, uploaded_blob_name)
-                    if not gs_uri:
-                        raise Exception("上传视频到Cloud Storage失败")
-                    
-                    logger.info(f"视频已上传到Cloud Storage: {gs_uri}")
-                    request = {"features": api_features, "input_uri": gs_uri}
-                    
-                    if progress_callback:
-                        progress_callback(25, f"视频已上传到云端，开始分析...")
-                else:
-                    # 小文件直接通过内容上传
-                    with open(video_path, "rb") as f:
-                        input_content = f.read()
-                    request = {"features": api_features, "input_content": input_content}
-                    
-            elif video_uri:
-                # 云端文件
-                request = {"features": api_features, "input_uri": video_uri}
-            else:
-                raise ValueError("必须提供video_path或video_uri")
+            request, bucket, uploaded_blob_name = self._build_request(
+                video_path, video_uri, features, progress_callback,
+                auto_cleanup_storage, bucket_name
+            )
 
             # 执行分析
             if progress_callback:
                 progress_callback(30, "正在提交分析请求到Google Cloud...")
 
-            # 添加重试机制
-            max_retries = 3
-            retry_count = 0
-            operation = None
-
-            while retry_count < max_retries:
-                try:
-                    operation = self.client.annotate_video(request=request)
-                    break  # 成功就退出循环
-                except Exception as e:
-                    retry_count += 1
-                    error_str = str(e)
-
-                    if "503" in error_str or "failed to connect" in error_str:
-                        if retry_count < max_retries:
-                            if progress_callback:
-                                progress_callback(30, f"网络连接失败，正在重试... ({retry_count}/{max_retries})")
-                            time.sleep(5)  # 等待5秒后重试
-                            continue
-                        else:
-                            raise Exception(f"网络连接失败，已重试{max_retries}次: {error_str}")
-                    else:
-                        raise e
+            # 连接失败时由客户端库按指数退避+抖动重试
+            operation = self.client.annotate_video(request=request, retry=self._submit_retry())
 
             if not operation:
                 raise Exception("无法提交分析请求到Google Cloud")
@@ -253,40 +216,28 @@ class GoogleVideoAnalyzer:
             if progress_callback:
                 progress_callback(35, f"分析请求已提交，操作ID: {operation.operation.name}")
 
-            # 等待完成
-            start_time = time.time()
+            # 等待完成：由LRO自身的退避轮询等待结果，进度由独立计时线程按耗时估算
             timeout = 1200  # 20分钟超时
-            check_interval = 10  # 每10秒检查一次
 
             if progress_callback:
                 progress_callback(40, "分析任务已提交到Google Cloud，正在处理...")
 
-            while not operation.done():
-                elapsed = time.time() - start_time
-                if elapsed > timeout:
+            stop_progress = self._start_progress_timer(progress_callback, timeout)
+            try:
+                result = operation.result(timeout=timeout)
+            except Exception as e:
+                from google.api_core import exceptions as core_exceptions
+                if isinstance(e, (core_exceptions.DeadlineExceeded, concurrent.futures.TimeoutError)):
+                    try:
+                        operation.cancel()
+                    except Exception as cancel_e:
+                        logger.warning(f"取消超时的分析操作失败: {cancel_e}")
                     error_msg = f"分析超时（{timeout}秒），视频可能太大或网络较慢"
                     logger.error(error_msg)
-                    raise TimeoutError(error_msg)
-
-                if progress_callback:
-                    # 非线性进度计算，前期慢后期快
-                    progress_ratio = min(elapsed / timeout, 0.8)
-                    progress = 40 + int(progress_ratio * 50)  # 40-90%
-
-                    # 估算剩余时间
-                    if elapsed > 30:  # 30秒后开始估算
-                        estimated_total = elapsed / progress_ratio if progress_ratio > 0 else timeout
-                        remaining = max(0, estimated_total - elapsed)
-                        progress_callback(
-                            progress,
-                            f"分析进行中... 已用时 {elapsed:.0f}秒，预计还需 {remaining:.0f}秒"
-                        )
-                    else:
-                        progress_callback(progress, f"分析进行中... 已用时 {elapsed:.0f}秒")
-
-                time.sleep(check_interval)
-
-            result = operation.result()
+                    raise TimeoutError(error_msg) from e
+                raise
+            finally:
+                stop_progress.set()
 
             if progress_callback:
                 progress_callback(95, "分析完成，正在处理结果...")
@@ -334,6 +285,393 @@ class GoogleVideoAnalyzer:
                 "features": features
             }
 
+    async def analyze_video_async(
+        self,
+        video_path: Optional[str] = None,
+        video_uri: Optional[str] = None,
+        features: List[str] = None,
+        auto_cleanup_storage: bool = False,
+        bucket_name: Optional[str] = None,
+        upload_semaphore: Optional[asyncio.Semaphore] = None,
+        request_semaphore: Optional[asyncio.Semaphore] = None
+    ) -> Dict[str, Any]:
+        """
+        异步分析视频内容
+
+        使用VideoIntelligenceServiceAsyncClient提交请求并等待长时间运行操作完成，
+        等待期间不占用线程，便于多个视频的分析请求同时在途。
+        上传与分析分别受各自的信号量限制，下一个视频的上传可以与
+        当前在途的分析请求重叠进行。
+
+        Args:
+            video_path: 本地视频文件路径
+            video_uri: 云端视频URI（如gs://bucket/video.mp4）
+            features: 要分析的功能列表
+            auto_cleanup_storage: 是否在分析完成后自动删除上传的文件
+            bucket_name: Cloud Storage桶名（如果不提供会使用默认的video-slice-bucket）
+            upload_semaphore: 限制同时上传数的信号量（可选）
+            request_semaphore: 限制在途分析请求数的信号量（可选）
+
+        Returns:
+            分析结果字典（与analyze_video一致）
+        """
+        if not self.client:
+            raise Exception("Google Cloud客户端未初始化")
+
+        uploaded_blob_name = None
+        bucket = None
+
+        try:
+            if not features:
+                features = ["shot_detection"]
+
+            # 上传属于阻塞IO，放到线程中执行
+            async with upload_semaphore or contextlib.nullcontext():
+                request, bucket, uploaded_blob_name = await asyncio.to_thread(
+                    self._build_request, video_path, video_uri, features,
+                    None, auto_cleanup_storage, bucket_name
+                )
+
+            client = self._get_async_client()
+
+            # 重试在持有请求名额期间进行，暂时性失败不需要重新排队
+            async with request_semaphore or contextlib.nullcontext():
+                result = await self._annotate_with_retry(client, request)
+
+            if auto_cleanup_storage and uploaded_blob_name and bucket:
+                try:
+                    await asyncio.to_thread(bucket.blob(uploaded_blob_name).delete)
+                    logger.info(f"已删除Cloud Storage文件: {uploaded_blob_name}")
+                except Exception as e:
+                    logger.warning(f"删除Cloud Storage文件失败 {uploaded_blob_name}: {str(e)}")
+
+            return {
+                "success": True,
+                "result": result,
+                "features": features,
+                "video_path": video_path,
+                "video_uri": video_uri,
+                "cleanup_performed": auto_cleanup_storage and uploaded_blob_name is not None
+            }
+
+        except Exception as e:
+            logger.error(f"Google Cloud视频分析失败: {str(e)}")
+
+            if auto_cleanup_storage and uploaded_blob_name and bucket:
+                try:
+                    await asyncio.to_thread(bucket.blob(uploaded_blob_name).delete)
+                    logger.info(f"分析失败，已清理Cloud Storage文件: {uploaded_blob_name}")
+                except Exception as cleanup_e:
+                    logger.warning(f"清理失败的上传文件时出错: {str(cleanup_e)}")
+
+            return {
+                "success": False,
+                "error": str(e),
+                "features": features
+            }
+
+    async def _annotate_with_retry(self, client, request: Dict[str, Any], timeout: float = 1200):
+        """
+        提交分析请求并等待结果，仅在提交阶段的配额错误时重试
+
+        配额错误（ResourceExhausted）的重试间隔为指数退避加随机抖动（最长120秒），
+        最多尝试ANALYSIS_ATTEMPTS次；服务不可用只由_submit_retry在单次提交内重试，不在此处叠加。
+        提交成功后只等待同一个操作：等待超时时取消该操作并抛出TimeoutError，
+        不会重新提交（重新提交会让同一视频被重复分析和计费）。
+        """
+        from google.api_core import exceptions as core_exceptions
+        for attempt in range(ANALYSIS_ATTEMPTS):
+            try:
+                operation = await client.annotate_video(
+                    request=request, retry=self._submit_retry(async_mode=True)
+                )
+                break
+            except core_exceptions.ResourceExhausted as e:
+                if attempt == ANALYSIS_ATTEMPTS - 1:
+                    raise
+                delay = min(120, 2 ** attempt + random.random())
+                logger.warning(f"分析请求暂时失败，{delay:.1f}秒后重试 ({attempt + 1}/{ANALYSIS_ATTEMPTS}): {e}")
+                await asyncio.sleep(delay)
+
+        if not operation:
+            raise Exception("无法提交分析请求到Google Cloud")
+
+        logger.info(f"分析请求已提交，操作ID: {operation.operation.name}")
+        try:
+            return await operation.result(timeout=timeout)
+        except (asyncio.TimeoutError, concurrent.futures.TimeoutError,
+                core_exceptions.DeadlineExceeded) as e:
+            try:
+                await operation.cancel()
+            except Exception as cancel_e:
+                logger.warning(f"取消超时的分析操作失败 {operation.operation.name}: {cancel_e}")
+            error_msg = f"分析超时（{timeout}秒），已取消操作 {operation.operation.name}"
+            logger.error(error_msg)
+            raise TimeoutError(error_msg) from e
+
+    def _progress_pump(self):
+        """进度事件消费线程：依次调用排队的进度回调"""
+        while True:
+            callback, progress, message = self._progress_queue.get()
+            try:
+                callback(progress, message)
+            except Exception as e:
+                logger.warning(f"进度回调执行失败: {e}")
+
+    def _queued_callback(self, callback: callable) -> callable:
+        """把进度回调包装为只入队不执行的版本"""
+        put = self._progress_queue.put_nowait
+        return lambda progress, message: put((callback, progress, message))
+
+    def _submit_retry(self, async_mode: bool = False):
+        """
+        构建提交分析请求的重试策略
+
+        仅对服务不可用重试，指数退避（1秒起，最长30秒）并带随机抖动，
+        避免多个并发视频在同一时刻集中重试；总重试时间不超过60秒。
+        annotate_video不是幂等请求，客户端超时（DeadlineExceeded）时请求可能已到达服务端，
+        重试会创建重复的分析操作，因此不重试。
+        """
+        from google.api_core import exceptions as core_exceptions
+        from google.api_core import retry as core_retry
+        from google.api_core import retry_async
+
+        retry_cls = retry_async.AsyncRetry if async_mode else core_retry.Retry
+        return retry_cls(
+            predicate=core_retry.if_exception_type(
+                core_exceptions.ServiceUnavailable
+            ),
+            initial=1.0,
+            maximum=30.0,
+            multiplier=2.0,
+            timeout=60.0
+        )
+
+    def _start_progress_timer(self, progress_callback: Optional[callable],
+                              timeout: float, interval: float = 10) -> threading.Event:
+        """
+        启动按耗时估算进度的计时线程（不调用API）
+
+        Returns:
+            设置后即停止计时线程的事件
+        """
+        stop_event = threading.Event()
+        if not progress_callback:
+            return stop_event
+
+        start_time = time.monotonic()
+        prefix = "分析进行中... 已用时 "
+
+        def report_progress():
+            last_progress = -1
+            while not stop_event.wait(interval):
+                elapsed = time.monotonic() - start_time
+                # 非线性进度计算，前期慢后期快
+                progress_ratio = min(elapsed / timeout, 0.8)
+                progress = 40 + int(progress_ratio * 50)  # 40-90%
+
+                # 进度百分比未变化时不重复构建消息和回调
+                if progress == last_progress:
+                    continue
+                last_progress = progress
+
+                # 估算剩余时间
+                if elapsed > 30:  # 30秒后开始估算
+                    estimated_total = elapsed / progress_ratio if progress_ratio > 0 else timeout
+                    remaining = max(0, estimated_total - elapsed)
+                    progress_callback(progress, f"{prefix}{elapsed:.0f}秒，预计还需 {remaining:.0f}秒")
+                else:
+                    progress_callback(progress, f"{prefix}{elapsed:.0f}秒")
+
+        threading.Thread(target=report_progress, name="gvi-progress", daemon=True).start()
+        return stop_event
+
+    def _get_async_client(self):
+        """
+        获取绑定当前事件循环的异步客户端（在客户端池中轮流选取）
+
+        每个客户端持有独立的gRPC通道（local subchannel pool保证各自建立连接），
+        并发请求分散到不同的HTTP/2连接上。
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client_cycle is None or self._async_client_loop is not loop:
+            from google.cloud import videointelligence_v1 as vi
+            from google.cloud.videointelligence_v1.services.video_intelligence_service.transports import (
+                VideoIntelligenceServiceGrpcAsyncIOTransport,
+            )
+            self._async_clients = [
+                vi.VideoIntelligenceServiceAsyncClient(
+                    transport=VideoIntelligenceServiceGrpcAsyncIOTransport(
+                        channel=VideoIntelligenceServiceGrpcAsyncIOTransport.create_channel(
+                            options=GRPC_CHANNEL_OPTIONS
+                        )
+                    )
+                )
+                for _ in range(self.async_channels)
+            ]
+            self._async_client_cycle = itertools.cycle(self._async_clients)
+            self._async_client_loop = loop
+        return next(self._async_client_cycle)
+
+    async def aclose(self):
+        """
+        关闭当前事件循环上共享的异步客户端池
+
+        批处理的所有协程共用同一组异步客户端（gRPC通道），
+        事件循环结束前调用，避免通道随循环销毁时遗留未关闭的连接。
+        """
+        clients = self._async_clients
+        self._async_clients = []
+        self._async_client_cycle = None
+        self._async_client_loop = None
+        for client in clients:
+            try:
+                await client.transport.close()
+            except Exception as e:
+                logger.warning(f"关闭异步客户端失败: {e}")
+
+    def _warm_up_connections(self):
+        """
+        预热到Google Cloud的连接（仅在初始化时执行一次）
+
+        提前建立Video Intelligence的gRPC/HTTP2通道，并为Cloud Storage的
+        HTTP会话挂载连接池，后续所有请求复用同一TLS连接。
+        """
+        try:
+            import grpc
+            channel = getattr(self.client.transport, "grpc_channel", None)
+            if channel is not None:
+                grpc.channel_ready_future(channel).result(timeout=5)
+                logger.info("Google Cloud Video Intelligence通道已就绪")
+        except Exception as e:
+            logger.warning(f"Video Intelligence连接预热失败（首次请求时重试连接）: {e}")
+
+        try:
+            from requests.adapters import HTTPAdapter
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, pool_block=False)
+            self.storage_client._http.mount("https://", adapter)
+        except Exception as e:
+            logger.warning(f"Cloud Storage连接池配置失败: {e}")
+
+        # 上传校验使用crc32c，纯Python实现会让大文件上传受限于CPU
+        try:
+            import google_crc32c
+            if google_crc32c.implementation != "c":
+                logger.warning("google-crc32c 未使用C扩展，大文件上传校验会明显变慢，请重新安装其二进制包")
+        except ImportError:
+            logger.warning("未安装 google-crc32c，无法使用crc32c校验上传")
+
+    def _build_request(
+        self,
+        video_path: Optional[str],
+        video_uri: Optional[str],
+        features: List[str],
+        progress_callback: Optional[callable] = None,
+        auto_cleanup_storage: bool = False,
+        bucket_name: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], Any, Optional[str]]:
+        """
+        构建annotate_video请求（必要时先上传到Cloud Storage）
+
+        Returns:
+            (请求字典, 存储桶, 上传的云端文件名)
+        """
+        from google.cloud import videointelligence_v1 as vi
+
+        uploaded_blob_name = None
+        bucket = None
+
+        # 转换功能名称为API枚举
+        feature_map = {
+            "shot_detection": vi.Feature.SHOT_CHANGE_DETECTION,
+            "label_detection": vi.Feature.LABEL_DETECTION,
+            "text_detection": vi.Feature.TEXT_DETECTION,
+            "face_detection": vi.Feature.FACE_DETECTION,
+            "object_tracking": vi.Feature.OBJECT_TRACKING
+        }
+
+        api_features = [feature_map[f] for f in features if f in feature_map]
+
+        # 一次stat同时完成存在性检查和大小获取
+        file_size = None
+        if video_path:
+            try:
+                file_size = os.stat(video_path).st_size
+            except FileNotFoundError:
+                file_size = None
+
+        # 构建请求
+        if file_size is not None:
+            # 检查文件大小
+            file_size_mb = file_size / (1024 * 1024)
+
+            if progress_callback:
+                progress_callback(15, f"准备处理视频文件 ({file_size_mb:.1f}MB)...")
+
+            # 大文件警告
+            if file_size_mb > 200:
+                logger.warning(f"视频文件较大 ({file_size_mb:.1f}MB)，分析可能需要较长时间")
+                if progress_callback:
+                    progress_callback(20, f"视频文件较大 ({file_size_mb:.1f}MB)，预计需要5-15分钟...")
+            elif file_size_mb > 50:
+                if progress_callback:
+                    progress_callback(20, f"视频文件大小适中 ({file_size_mb:.1f}MB)，预计需要2-5分钟...")
+            else:
+                if progress_callback:
+                    progress_callback(20, f"视频文件较小 ({file_size_mb:.1f}MB)，预计1-2分钟完成...")
+
+            # 始终流式上传到Cloud Storage并按URI分析，避免把整个文件读入内存
+            if progress_callback:
+                progress_callback(22, "上传视频到Cloud Storage...")
+            
+            # 准备Cloud Storage桶
+            if not bucket_name:
+                bucket_name = "video-slice-bucket"
+            
+            bucket = self._ensure_bucket_exists(bucket_name)
+            if not bucket:
+                raise Exception(f"无法创建或访问存储桶: {bucket_name}")
+            
+            # 生成唯一的云端文件名
+            timestamp = int(time.time())
+            file_name = f"slice_analysis_{timestamp}_{uuid.uuid4().hex[:8]}_{Path(video_path).name}"
+            uploaded_blob_name = f"video-analysis/{file_name}"
+            
+            # 上传文件到Cloud Storage
+            gs_uri = self._upload_to_cloud_storage(bucket, video_path, uploaded_blob_name, file_size)
+            if not gs_uri:
+                raise Exception("上传视频到Cloud Storage失败")
+            
+            logger.info(f"视频已上传到Cloud Storage: {gs_uri}")
+            request = {"features": api_features, "input_uri": gs_uri}
+            
+            if progress_callback:
+                progress_callback(25, f"视频已上传到云端，开始分析...")
+                
+        elif video_uri:
+            # 云端文件
+            request = {"features": api_features, "input_uri": video_uri}
+        else:
+            raise ValueError("必须提供video_path或video_uri")
+
+        # 镜头检测显式使用最新内置模型
+        if vi.Feature.SHOT_CHANGE_DETECTION in api_features:
+            request["video_context"] = vi.VideoContext(
+                shot_change_detection_config=vi.ShotChangeDetectionConfig(model="builtin/latest")
+            )
+
+        return request, bucket, uploaded_blob_name
+
+    def result_to_json(self, result) -> str:
+        """将AnnotateVideoResponse序列化为JSON字符串（用于缓存）"""
+        from google.cloud import videointelligence_v1 as vi
+        return vi.AnnotateVideoResponse.to_json(result)
+
+    def result_from_json(self, payload: str):
+        """从JSON字符串还原AnnotateVideoResponse"""
+        from google.cloud import videointelligence_v1 as vi
+        return vi.AnnotateVideoResponse.from_json(payload, ignore_unknown_fields=True)
+
     def extract_shots(self, analysis_result: Dict[str, Any]) -> List[Dict[str, Any]]:
         """从分析结果中提取镜头信息"""
         shots = []
@@ -345,27 +683,43 @@ class GoogleVideoAnalyzer:
         if not result.annotation_results:
             return shots
 
+        # 直接读取底层protobuf，避免proto-plus对每个字段做包装转换
         annotation = result.annotation_results[0]
+        shot_pbs = type(annotation).pb(annotation).shot_annotations
+        if not shot_pbs:
+            return shots
 
-        if hasattr(annotation, 'shot_annotations') and annotation.shot_annotations:
-            for i, shot in enumerate(annotation.shot_annotations):
-                try:
-                    start_time = self._get_time_seconds(shot.start_time_offset)
-                    end_time = self._get_time_seconds(shot.end_time_offset)
-
-                    shots.append({
-                        'index': i + 1,
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'duration': end_time - start_time,
-                        'type': f"镜头{i+1}",
-                        'confidence': 1.0
-                    })
-                except Exception as e:
-                    logger.warning(f"处理镜头 {i+1} 时出错: {e}")
+        # 先按列收集起止时间（SoA），再一次性组装镜头列表
+        # 原生Duration直接按 seconds + nanos 计算，省去逐个调用_get_time_seconds
+        starts = [shot.start_time_offset.seconds + shot.start_time_offset.nanos * 1e-9 for shot in shot_pbs]
+        ends = [shot.end_time_offset.seconds + shot.end_time_offset.nanos * 1e-9 for shot in shot_pbs]
+
+        shots = [
+            {
+                'index': i,
+                'start_time': start_time,
+                'end_time': end_time,
+                'duration': end_time - start_time,
+                'type': f"镜头{i}",
+                'confidence': 1.0
+            }
+            for i, (start_time, end_time) in enumerate(zip(starts, ends), 1)
+        ]
 
         return shots
 
+    def extract_duration(self, analysis_result: Dict[str, Any]) -> Optional[float]:
+        """从分析结果中读取视频时长（分析片段的结束时间），不可用时返回None"""
+        result = analysis_result.get("result") if analysis_result.get("success") else None
+        if not result or not result.annotation_results:
+            return None
+
+        annotation = result.annotation_results[0]
+        segment = type(annotation).pb(annotation).segment
+        end = segment.end_time_offset
+        duration = end.seconds + end.nanos * 1e-9
+        return duration if duration > 0 else None
+
     def extract_labels(self, analysis_result: Dict[str, Any]) -> List[Dict[str, Any]]:
         """从分析结果中提取标签信息"""
         labels = []
@@ -378,68 +732,153 @@ class GoogleVideoAnalyzer:
             return labels
 
         annotation = result.annotation_results[0]
+        label_pbs = type(annotation).pb(annotation).segment_label_annotations
+        if not label_pbs:
+            return labels
 
-        if hasattr(annotation, 'segment_label_annotations') and annotation.segment_label_annotations:
-            for label in annotation.segment_label_annotations:
-                label_name = label.entity.description
-
-                for segment in label.segments:
-                    try:
-                        start_time = self._get_time_seconds(segment.segment.start_time_offset)
-                        end_time = self._get_time_seconds(segment.segment.end_time_offset)
-                        confidence = segment.confidence
-
-                        labels.append({
-                            'label': label_name,
-                            'start_time': start_time,
-                            'end_time': end_time,
-                            'duration': end_time - start_time,
-                            'confidence': confidence,
-                            'type': f"标签_{label_name}"
-                        })
-                    except Exception as e:
-                        logger.warning(f"处理标签 {label_name} 时出错: {e}")
+        # 按列收集：标签名、起止时间、置信度
+        names = []
+        starts = []
+        ends = []
+        confidences = []
+        for label in label_pbs:
+            segments = label.segments
+            names.extend([label.entity.description] * len(segments))
+            starts.extend([seg.segment.start_time_offset.seconds + seg.segment.start_time_offset.nanos * 1e-9
+                           for seg in segments])
+            ends.extend([seg.segment.end_time_offset.seconds + seg.segment.end_time_offset.nanos * 1e-9
+                         for seg in segments])
+            confidences.extend([seg.confidence for seg in segments])
+
+        labels = [
+            {
+                'label': label_name,
+                'start_time': start_time,
+                'end_time': end_time,
+                'duration': end_time - start_time,
+                'confidence': confidence,
+                'type': f"标签_{label_name}"
+            }
+            for label_name, start_time, end_time, confidence in zip(names, starts, ends, confidences)
+        ]
 
         return labels
 
     def _get_time_seconds(self, time_offset) -> float:
         """安全地获取时间偏移的秒数"""
         try:
-            if hasattr(time_offset, 'total_seconds'):
+            # protobuf Duration 对象（最常见）
+            return time_offset.seconds + time_offset.nanos * 1e-9
+        except AttributeError:
+            pass
+
+        try:
+            if isinstance(time_offset, datetime.timedelta):
                 return time_offset.total_seconds()
-            elif hasattr(time_offset, 'seconds'):
-                # 处理 protobuf Duration 对象
-                return time_offset.seconds + time_offset.nanos / 1e9
-            else:
-                # 如果是数字，直接返回
-                return float(time_offset)
+            # 如果是数字，直接返回
+            return float(time_offset)
         except Exception as e:
             logger.warning(f"时间解析错误: {e}")
             return 0.0
 
     def _ensure_bucket_exists(self, bucket_name: str):
-        """确保Cloud Storage桶存在"""
+        """确保Cloud Storage桶存在（每个桶在进程内只检查一次）"""
+        bucket = self._bucket_cache.get(bucket_name)
+        if bucket is not None:
+            return bucket
+
         try:
-            bucket = self.storage_client.bucket(bucket_name)
-            if not bucket.exists():
-                bucket = self.storage_client.create_bucket(bucket_name)
-                logger.info(f"创建了新的存储桶: {bucket_name}")
-            else:
-                logger.info(f"使用现有存储桶: {bucket_name}")
+            with self._bucket_lock:
+                bucket = self._bucket_cache.get(bucket_name)
+                if bucket is not None:
+                    return bucket
+
+                from google.api_core.exceptions import Conflict
+
+                # 直接尝试创建，已存在时返回Conflict，省去一次exists()往返
+                try:
+                    bucket = self.storage_client.create_bucket(bucket_name)
+                    logger.info(f"创建了新的存储桶: {bucket_name}")
+                except Conflict:
+                    bucket = self.storage_client.bucket(bucket_name)
+                    logger.info(f"使用现有存储桶: {bucket_name}")
+                self._bucket_cache[bucket_name] = bucket
             return bucket
         except Exception as e:
             logger.error(f"无法创建或访问存储桶 {bucket_name}: {str(e)}")
             return None
 
-    def _upload_to_cloud_storage(self, bucket, local_path: str, blob_name: str) -> Optional[str]:
-        """上传文件到Cloud Storage"""
+    def _stream_upload(self, blob, local_path: str, file_size: int):
+        """按块流式上传文件（可续传上传，crc32c校验）"""
+        content_type = mimetypes.guess_type(local_path)[0] or "video/mp4"
+        blob.chunk_size = 8 * 1024 * 1024
+        with open(local_path, "rb") as f:
+            blob.upload_from_file(f, size=file_size, content_type=content_type, checksum="crc32c")
+
+    def _upload_to_cloud_storage(self, bucket, local_path: str, blob_name: str,
+                                 file_size: Optional[int] = None) -> Optional[str]:
+        """
+        上传文件到Cloud Storage
+
+        超过一个分片大小的文件使用XML多部分上传，多个线程并发上传各分片（逐分片crc32c校验）；
+        失败时由transfer_manager中止上传，不会遗留未完成的分片。
+        其余文件按8MB块流式断点续传，使用crc32c校验，文件不会整体读入内存。
+        file_size由调用方已stat得到时直接传入，避免重复获取。
+        """
         try:
             blob = bucket.blob(blob_name)
-            blob.upload_from_filename(local_path)
+            if file_size is None:
+                file_size = os.path.getsize(local_path)
+
+            if file_size > self.upload_part_size and self.max_concurrent_parts > 1:
+                try:
+                    from google.cloud.storage import transfer_manager
+                except ImportError:  # google-cloud-storage < 2.14
+                    transfer_manager = None
+
+                if transfer_manager is not None:
+                    transfer_manager.upload_chunks_concurrently(
+                        local_path,
+                        blob,
+                        chunk_size=self.upload_part_size,
+                        max_workers=self.max_concurrent_parts,
+                        worker_type=transfer_manager.THREAD,
+                        checksum="crc32c"
+                    )
+                else:
+                    self._stream_upload(blob, local_path, file_size)
+            else:
+                self._stream_upload(blob, local_path, file_size)
             
             gs_uri = f"gs://{bucket.name}/{blob_name}"
             logger.info(f"文件上传成功: {gs_uri}")
             return gs_uri
         except Exception as e:
             logger.error(f"上传文件到Cloud Storage失败: {str(e)}")
-            return None 
\ No newline at end of file
+            return None 
+
+
+def get_analyzer(credentials_path: Optional[str] = None, async_channels: int = 1) -> GoogleVideoAnalyzer:
+    """
+    获取进程内共享的视频分析器
+
+    首次调用时创建，之后复用同一组API客户端、gRPC通道和存储桶缓存，
+    避免每次处理都重新建立连接。fork出的子进程不复用父进程的gRPC通道，
+    会在子进程内重新创建。
+
+    Args:
+        credentials_path: Google Cloud凭据文件路径（仅首次创建时生效）
+        async_channels: 异步分析所需的gRPC通道数，取各调用方要求的最大值
+
+    Returns:
+        共享的GoogleVideoAnalyzer实例
+    """
+    global _ANALYZER, _ANALYZER_PID
+    with _ANALYZER_LOCK:
+        if _ANALYZER is None or _ANALYZER_PID != os.getpid():
+            _ANALYZER = GoogleVideoAnalyzer(credentials_path, async_channels=async_channels)
+            _ANALYZER_PID = os.getpid()
+        elif async_channels > _ANALYZER.async_channels:
+            # 已创建的客户端池保持不变，下次在新事件循环上创建时按新通道数生效
+            _ANALYZER.async_channels = async_channels
+        return _ANALYZER
@@ -13,43 +13,220 @@ AI Video Master 5.0 - 并行批量视频处理器 (精简版)
 """
 
 import asyncio
+import atexit
+import fnmatch
+import functools
+import hashlib
+import itertools
 import json
 import logging
+import multiprocessing
 import os
+import queue
+import subprocess
 import sys
 import time
+import uuid
 import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
-from tenacity import retry, wait_random_exponential, stop_after_attempt
 
-# 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
+# 内存中保留的最大错误记录数，更早的错误写入旁路NDJSON文件
+MAX_ERRORS_IN_MEMORY = 1000
+
+_LOG_LISTENER: Optional[QueueListener] = None
+_LOG_LISTENER_PID: Optional[int] = None
+
+
+def _merge_short_shots(shots: List[Dict[str, Any]], min_duration: float) -> List[Dict[str, Any]]:
+    """
+    在调度FFmpeg前合并过短的镜头
+    
+    短于min_duration的镜头并入前一个镜头（首个镜头并入后一个），
+    保持镜头首尾相接，流复制分段仍然可用。
+    
+    Args:
+        shots: 按时间排序的镜头列表
+        min_duration: 最短镜头时长（秒），0表示不合并
+        
+    Returns:
+        合并后的镜头列表
+    """
+    if min_duration <= 0 or len(shots) < 2:
+        return shots
+    
+    merged = []
+    for shot in shots:
+        if merged and shot['end_time'] - shot['start_time'] < min_duration:
+            previous = merged[-1]
+            merged[-1] = {**previous, 'end_time': shot['end_time'],
+                          'duration': shot['end_time'] - previous['start_time']}
+        else:
+            merged.append(shot)
+    
+    if len(merged) > 1 and merged[0]['end_time'] - merged[0]['start_time'] < min_duration:
+        first, second = merged[0], merged[1]
+        merged[1] = {**second, 'start_time': first['start_time'],
+                     'duration': second['end_time'] - first['start_time']}
+        del merged[0]
+    
+    if len(merged) < len(shots):
+        logger.info(f"合并 {len(shots) - len(merged)} 个短于 {min_duration} 秒的镜头")
+    return merged
+
+
+def configure_logging(level: int = logging.INFO, log_file: str = 'parallel_video_slice.log'):
+    """
+    配置队列日志：热路径只做入队，由后台线程写入控制台和日志文件
+    
+    与basicConfig一致，根日志器已被其他入口配置时不做改动；
+    在fork出的子进程中调用会为该进程重新启动监听线程。
+    
+    Args:
+        level: 日志级别
+        log_file: 日志文件路径
+    """
+    global _LOG_LISTENER, _LOG_LISTENER_PID
+    
+    root = logging.getLogger()
+    if _LOG_LISTENER is None and root.handlers:
+        return
+    if _LOG_LISTENER_PID == os.getpid():
+        return
+    
+    # 移除从父进程继承的队列处理器（其监听线程不在本进程中）
+    for handler in root.handlers[:]:
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [
         logging.StreamHandler(),
-        logging.FileHandler('parallel_video_slice.log', encoding='utf-8')
+        logging.FileHandler(log_file, encoding='utf-8')
     ]
-)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+    
+    _LOG_LISTENER = QueueListener(log_queue, *handlers)
+    _LOG_LISTENER.start()
+    _LOG_LISTENER_PID = os.getpid()
+    atexit.register(_LOG_LISTENER.stop)
+
+
+# 设置日志
+configure_logging()
 logger = logging.getLogger(__name__)
 
 try:
-    from google_video_analyzer import GoogleVideoAnalyzer
+    from google_video_analyzer import get_analyzer
     from parallel_video_slicer import ParallelVideoSlicer
 except ImportError as e:
     logger.error(f"依赖模块导入失败: {e}")
     logger.error("请确保所有依赖文件在同一目录下")
     sys.exit(1)
 
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时回退到标准库json
+    orjson = None
+
+
+def _json_bytes(payload: Any, indent: bool = False) -> bytes:
+    """将数据序列化为UTF-8 JSON字节（优先使用orjson）"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(payload, default=str, option=option)
+    return json.dumps(payload, ensure_ascii=False, indent=2 if indent else None,
+                      default=str).encode('utf-8')
+
+
+def _json_loads(data: bytes) -> Any:
+    """解析UTF-8 JSON字节（优先使用orjson）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# 支持的视频扩展名
+VALID_EXTS = frozenset({'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv'})
+
+# 连续成功多少次后把并发上限恢复一级
+CONCURRENCY_RECOVERY_SUCCESSES = 5
+
+
+@dataclass(slots=True)
+class BatchStats:
+    """批处理统计信息（只在批处理完成循环中更新）"""
+    total_videos: int = 0
+    processed_videos: int = 0
+    failed_videos: int = 0
+    total_slices: int = 0
+    # 只保留最近的错误，溢出部分由批处理写入旁路文件
+    processing_errors: deque = field(default_factory=lambda: deque(maxlen=MAX_ERRORS_IN_MEMORY))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可序列化的字典（报告和返回值使用）"""
+        return {
+            "total_videos": self.total_videos,
+            "processed_videos": self.processed_videos,
+            "failed_videos": self.failed_videos,
+            "total_slices": self.total_slices,
+            "processing_errors": list(self.processing_errors)
+        }
+
+
+class ConcurrencyLimiter:
+    """
+    可动态调整上限的异步并发限制器
+    
+    以 asyncio.Condition + 计数器实现，用法与 asyncio.Semaphore 相同
+    （async with），但可以在运行中通过 set_limit 安全地扩大或缩小上限。
+    """
+    
+    def __init__(self, limit: int):
+        self._limit = max(1, limit)
+        self._inflight = 0
+        self._cv = asyncio.Condition()
+    
+    @property
+    def limit(self) -> int:
+        return self._limit
+    
+    async def set_limit(self, limit: int) -> None:
+        """调整并发上限；缩小时已在途的任务不受影响，只是新任务需要等待"""
+        async with self._cv:
+            self._limit = max(1, limit)
+            self._cv.notify_all()
+    
+    async def __aenter__(self):
+        async with self._cv:
+            await self._cv.wait_for(lambda: self._inflight < self._limit)
+            self._inflight += 1
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._cv:
+            self._inflight -= 1
+            self._cv.notify(1)
+
 
 class ParallelBatchProcessor:
     """并行批量视频切片处理器 - 精简版"""
     
     def __init__(self, output_dir: str = "./output_slices", temp_dir: str = "./temp", 
-                 max_concurrent: int = 3, ffmpeg_workers: int = 4):
+                 max_concurrent: int = 3, ffmpeg_workers: int = 0, workers: int = 0,
+                 use_cache: bool = True, concat_short_seconds: float = 0,
+                 concat_group_seconds: float = 600, min_shot_duration: float = 0):
         """
         初始化并行批量视频切片处理器
         
@@ -57,79 +234,227 @@ class ParallelBatchProcessor:
             output_dir: 输出目录
             temp_dir: 临时目录
             max_concurrent: 最大并发数（默认3，遵循Google Cloud API配额限制）
-            ffmpeg_workers: FFmpeg并行切片工作线程数（默认4）
+            ffmpeg_workers: FFmpeg并行切片进程数（默认0，按CPU核心数自动计算）
+            workers: 视频级工作进程数（默认0，在当前进程的线程中处理；
+                     大于0时使用进程池，上限为CPU核心数）
+            use_cache: 是否复用磁盘上的视频分析结果缓存（默认True）
+            concat_short_seconds: 短于该时长（秒）的视频合并后一次提交分析（默认0，不合并；
+                                  只合并流参数一致的视频，仅线程模式生效）
+            concat_group_seconds: 每组合并视频的最大总时长（秒）
+            min_shot_duration: 最短镜头时长（秒），更短的镜头并入相邻镜头（默认0，不合并）
         """
+        self._created_dirs = set()
         self.output_dir = Path(output_dir)
         self.temp_dir = Path(temp_dir)
-        self.output_dir.mkdir(exist_ok=True)
-        self.temp_dir.mkdir(exist_ok=True)
+        self._ensure_dir(self.output_dir)
+        self._ensure_dir(self.temp_dir)
         
         # 并发控制
         self.max_concurrent = max_concurrent
-        self.semaphore = asyncio.Semaphore(max_concurrent)
+        # API请求并发上限可在运行中调整：遇到配额限流时减半，连续成功后逐步恢复
+        self.semaphore = ConcurrencyLimiter(max_concurrent)
+        self._consecutive_successes = 0
+        # 上传单独限流，使后续视频的上传与在途分析请求重叠
+        self.upload_semaphore = asyncio.Semaphore(max_concurrent)
+        
+        # 进程池配置（每个工作进程独立创建分析器和切片器）
+        self.ffmpeg_workers = ffmpeg_workers
+        self.workers = min(os.cpu_count() or 1, workers) if workers > 0 else 0
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._worker_fn: Optional[functools.partial] = None
+        # 线程模式下的切片、缓存读写等阻塞工作使用与并发数一致的有界线程池（批处理期间存在）
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        
+        # 分析结果缓存（按文件路径、修改时间、大小和分析功能寻址）
+        self.use_cache = use_cache
+        self.cache_dir = self.temp_dir / "gvi_cache"
+        if use_cache:
+            self._ensure_dir(self.cache_dir)
+        
+        # 短视频合并分析配置
+        self.concat_short_seconds = concat_short_seconds
+        self.concat_group_seconds = concat_group_seconds
+        self.min_shot_duration = min_shot_duration
+        
+        # 视频时长缓存（按真实路径+修改时间），重试和默认分割时不重复探测
+        self._duration_cache: Dict[Tuple[str, int], float] = {}
+        self._duration_lock = asyncio.Lock()
         
         # 初始化组件
-        self.analyzer = GoogleVideoAnalyzer()
+        # 每个并发分析名额对应一条gRPC通道，请求轮流分配到各通道
+        self.analyzer = get_analyzer(async_channels=max_concurrent)
         self.parallel_slicer = ParallelVideoSlicer(max_workers=ffmpeg_workers)
         
         # 统计信息
-        self.stats = {
-            "total_videos": 0,
-            "processed_videos": 0,
-            "failed_videos": 0,
-            "total_slices": 0,
-            "processing_errors": []
-        }
+        self.stats = BatchStats()
         
-        logger.info(f"初始化并行处理器 - 最大并发数: {max_concurrent}, FFmpeg工作线程: {ffmpeg_workers}")
+        logger.info(f"初始化并行处理器 - 最大并发数: {max_concurrent}, "
+                    f"FFmpeg工作进程: {self.parallel_slicer.max_workers}")
     
-    def _validate_video_file(self, video_path: str) -> bool:
-        """验证视频文件"""
-        try:
-            if not os.path.exists(video_path):
+    def _ensure_dir(self, path) -> None:
+        """创建目录；已确认存在的目录直接跳过，避免重复的mkdir系统调用"""
+        key = str(path)
+        if key not in self._created_dirs:
+            os.makedirs(key, exist_ok=True)
+            self._created_dirs.add(key)
+    
+    def _create_output_dirs(self, video_files: List[str]) -> None:
+        """为批次内所有视频创建输出目录（记入已创建集合，后续_ensure_dir直接跳过）"""
+        for video_file in video_files:
+            self._ensure_dir(self.output_dir / Path(video_file).stem)
+    
+    def _validate_video_file(self, video_path: str, st: Optional[os.stat_result] = None) -> bool:
+        """
+        验证视频文件
+        
+        Args:
+            video_path: 视频文件路径
+            st: 调用方已获取的os.stat结果（提供时不再重复stat）
+        """
+        if st is None:
+            # 一次stat同时完成存在性检查和获取大小
+            try:
+                st = os.stat(video_path)
+            except OSError:
                 return False
+        if st.st_size == 0:
+            return False
+        
+        # 简单的文件格式检查
+        return os.path.splitext(video_path)[1].lower() in VALID_EXTS
+    
+    async def _probe_duration(self, video_path: str) -> Optional[float]:
+        """
+        异步调用ffprobe获取视频时长，等待期间不占用线程池
+        
+        Args:
+            video_path: 视频文件路径
             
-            file_size = os.path.getsize(video_path)
-            if file_size == 0:
-                return False
+        Returns:
+            视频时长（秒），失败时返回None
+        """
+        proc = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "quiet", "-show_entries", "format=duration",
+            "-of", "csv=p=0", video_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            out, _ = await asyncio.wait_for(proc.communicate(), timeout=30)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise
+        return float(out.decode().strip()) if proc.returncode == 0 else None
+    
+    async def _cached_duration(self, video_path: str) -> Optional[float]:
+        """获取视频时长，同一文件（未修改时）只调用一次ffprobe"""
+        key = (os.path.realpath(video_path), os.stat(video_path).st_mtime_ns)
+        duration = self._duration_cache.get(key)
+        if duration is not None:
+            return duration
+        
+        async with self._duration_lock:
+            duration = self._duration_cache.get(key)
+            if duration is None:
+                duration = await self._probe_duration(video_path)
+                if duration:
+                    self._duration_cache[key] = duration
+        return duration
+    
+    async def _probe_durations(self, paths: List[str],
+                               max_concurrent_probes: int = 8) -> Dict[str, Optional[float]]:
+        """
+        批量获取视频时长，有限并发调用ffprobe，结果写入时长缓存
+        
+        Args:
+            paths: 视频文件路径列表
+            max_concurrent_probes: 同时运行的ffprobe进程数上限
             
-            # 简单的文件格式检查
-            valid_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv'}
-            if Path(video_path).suffix.lower() not in valid_extensions:
-                return False
+        Returns:
+            路径到时长（秒）的映射，获取失败时为None
+        """
+        probe_semaphore = asyncio.Semaphore(max_concurrent_probes)
+        
+        async def probe(path: str) -> Optional[float]:
+            try:
+                key = (os.path.realpath(path), os.stat(path).st_mtime_ns)
+                duration = self._duration_cache.get(key)
+                if duration is None:
+                    async with probe_semaphore:
+                        duration = await self._probe_duration(path)
+                    if duration:
+                        self._duration_cache[key] = duration
+                return duration
+            except (OSError, ValueError, asyncio.TimeoutError) as e:
+                logger.warning(f"获取视频时长失败 {path}: {e}")
+                return None
+        
+        paths = [str(p) for p in paths]
+        durations = await asyncio.gather(*(probe(p) for p in paths))
+        return dict(zip(paths, durations))
+    
+    async def _probe_stream_signatures(self, paths: List[str], max_concurrent_probes: int = 8
+                                       ) -> Dict[str, Optional[Tuple[str, ...]]]:
+        """
+        批量获取视频的流参数签名（编码、分辨率、帧率、时间基、像素格式、音频参数），
+        签名相同的视频才能用concat分离器流复制合并
+        
+        Args:
+            paths: 视频文件路径列表
+            max_concurrent_probes: 同时运行的ffprobe进程数上限
             
-            return True
-        except Exception:
-            return False
+        Returns:
+            路径到签名（每个流一行参数）的映射，获取失败时为None
+        """
+        probe_semaphore = asyncio.Semaphore(max_concurrent_probes)
+        
+        async def probe(path: str) -> Optional[Tuple[str, ...]]:
+            try:
+                async with probe_semaphore:
+                    proc = await asyncio.create_subprocess_exec(
+                        "ffprobe", "-v", "error", "-show_entries",
+                        "stream=codec_type,codec_name,profile,width,height,pix_fmt,"
+                        "r_frame_rate,time_base,sample_rate,channels",
+                        "-of", "compact=p=0:nk=1", path,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.DEVNULL
+                    )
+                    try:
+                        out, _ = await asyncio.wait_for(proc.communicate(), timeout=30)
+                    except asyncio.TimeoutError:
+                        proc.kill()
+                        await proc.wait()
+                        raise
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.warning(f"获取视频流参数失败 {path}: {e}")
+                return None
+            lines = tuple(line.strip() for line in out.decode(errors='replace').splitlines() if line.strip())
+            return lines if proc.returncode == 0 and lines else None
+        
+        signatures = await asyncio.gather(*(probe(p) for p in paths))
+        return dict(zip(paths, signatures))
     
-    def _create_default_shots(self, video_path: str, segment_duration: float = 10.0) -> List[Dict[str, Any]]:
+    async def _create_default_shots(self, video_path: str, segment_duration: float = 10.0,
+                                    duration: Optional[float] = None) -> List[Dict[str, Any]]:
         """
         创建默认的时间段切片（当无法检测到镜头时）
         
         Args:
             video_path: 视频文件路径
             segment_duration: 每个片段的时长（秒）
+            duration: 已知的视频时长（秒），为None时探测
             
         Returns:
             默认切片列表
         """
         try:
-            # 使用ffprobe获取视频时长
-            import subprocess
-            cmd = [
-                "ffprobe", "-v", "quiet", "-show_entries", "format=duration",
-                "-of", "csv=p=0", video_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode != 0:
+            if not duration:
+                duration = await self._cached_duration(video_path)
+            if not duration or duration <= 0:
                 logger.error(f"无法获取视频时长: {video_path}")
                 return []
             
-            duration = float(result.stdout.strip())
-            if duration <= 0:
-                return []
-            
             shots = []
             current_time = 0
             index = 1
@@ -156,6 +481,33 @@ class ParallelBatchProcessor:
             logger.error(f"创建默认切片失败: {e}")
             return []
     
+    async def _resolve_shots(self, video_path: str, analysis_result: Dict[str, Any],
+                             shots: Optional[List[Dict[str, Any]]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        在事件循环中确定镜头列表，未检测到镜头时异步生成默认分割
+        
+        Args:
+            video_path: 视频文件路径
+            analysis_result: 分析结果
+            shots: 已确定的镜头列表（为None时从分析结果中提取）
+            
+        Returns:
+            镜头列表
+        """
+        if not analysis_result.get("success"):
+            return None  # 由_slice_analyzed_video报告分析失败
+        if shots is None:
+            shots = analysis_result.get("shots")
+            if shots is None:
+                shots = self.analyzer.extract_shots(analysis_result)
+        if not shots:
+            logger.warning(f"未检测到镜头，使用默认分割方案: {Path(video_path).stem}")
+            # 分析结果中已包含视频时长时无需再调用ffprobe
+            shots = await self._create_default_shots(
+                video_path, duration=self.analyzer.extract_duration(analysis_result)
+            )
+        return shots
+    
     def _validate_slice_quality(self, slices: List[Dict[str, Any]], video_name: str) -> Dict[str, Any]:
         """验证切片质量"""
         if not slices:
@@ -170,12 +522,25 @@ class ParallelBatchProcessor:
         valid_slices = 0
         total_duration = 0
         
-        for slice_info in slices:
-            if 'file_path' in slice_info and os.path.exists(slice_info['file_path']):
-                file_size = os.path.getsize(slice_info['file_path'])
-                if file_size > 1024:  # 至少1KB
-                    valid_slices += 1
-                    total_duration += slice_info.get('duration', 0)
+        # 按目录分组，每个输出目录只扫描一次，避免逐个文件 exists + getsize
+        located = [(os.path.split(s['file_path']), s) for s in slices if 'file_path' in s]
+        sizes_by_dir: Dict[str, Dict[str, int]] = {}
+        for (directory, _), _ in located:
+            if directory in sizes_by_dir:
+                continue
+            try:
+                with os.scandir(directory or ".") as entries:
+                    sizes_by_dir[directory] = {
+                        entry.name: entry.stat().st_size for entry in entries if entry.is_file()
+                    }
+            except OSError as e:
+                logger.warning(f"无法扫描切片目录 {directory}: {e}")
+                sizes_by_dir[directory] = {}
+        
+        for (directory, name), slice_info in located:
+            if sizes_by_dir[directory].get(name, 0) > 1024:  # 至少1KB
+                valid_slices += 1
+                total_duration += slice_info.get('duration', 0)
         
         success_rate = (valid_slices / total_slices) * 100 if total_slices > 0 else 0
         
@@ -193,6 +558,153 @@ class ParallelBatchProcessor:
             }
         }
     
+    def _analysis_cache_key(self, video_path: str, features: List[str],
+                            st: Optional[os.stat_result] = None) -> Optional[str]:
+        """计算分析结果缓存键，禁用缓存时返回None"""
+        if not self.use_cache:
+            return None
+        
+        # 纳秒级修改时间和大小，文件变化后缓存自动失效
+        if st is None:
+            st = os.stat(video_path)
+        raw = (f"{os.path.abspath(video_path)}|{st.st_mtime_ns}|"
+               f"{st.st_size}|{','.join(sorted(features))}")
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _load_cached_analysis(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的分析结果，未命中时返回None
+        
+        优先读取已提取的镜头列表（<key>.shots.json），命中时无需反序列化完整的API响应。
+        """
+        if not cache_key:
+            return None
+        
+        cache_file = self.cache_dir / f"{cache_key}.json"
+        shots_file = self.cache_dir / f"{cache_key}.shots.json"
+        # 只有写入完成标记存在时才视为有效缓存，避免读到写了一半的文件
+        if not (self.cache_dir / f"{cache_key}.complete").exists():
+            return None
+        
+        if shots_file.exists():
+            try:
+                cached = _json_loads(shots_file.read_bytes())
+                
+                return {
+                    "success": True,
+                    "result": None,
+                    "shots": cached["shots"],
+                    "features": cached.get("features"),
+                    "video_path": cached.get("video_path"),
+                    "video_uri": None,
+                    "cache_hit": True
+                }
+            except Exception as e:
+                logger.warning(f"读取镜头缓存失败 {shots_file}: {e}")
+        
+        if not cache_file.exists():
+            return None
+        
+        try:
+            cached = _json_loads(cache_file.read_bytes())
+            
+            return {
+                "success": True,
+                "result": self.analyzer.result_from_json(cached["result"]),
+                "features": cached.get("features"),
+                "video_path": cached.get("video_path"),
+                "video_uri": None,
+                "cache_hit": True
+            }
+        except Exception as e:
+            logger.warning(f"读取分析缓存失败 {cache_file}: {e}")
+            return None
+    
+    def _store_cached_analysis(self, cache_key: Optional[str], analysis_result: Dict[str, Any]):
+        """原子写入分析结果缓存（先写临时文件再替换，最后写完成标记）"""
+        if not cache_key or not analysis_result.get("success") or analysis_result.get("cache_hit"):
+            return
+        
+        cache_file = self.cache_dir / f"{cache_key}.json"
+        tmp_file = self.cache_dir / f"{cache_key}.json.tmp"
+        shots_file = self.cache_dir / f"{cache_key}.shots.json"
+        
+        try:
+            # 同时缓存提取后的镜头列表，后续命中时跳过protobuf遍历
+            analysis_result["shots"] = self.analyzer.extract_shots(analysis_result)
+            with open(tmp_file, 'wb') as f:
+                f.write(_json_bytes({
+                    'video_path': analysis_result.get("video_path"),
+                    'features': analysis_result.get("features"),
+                    'shots': analysis_result["shots"]
+                }))
+            os.replace(tmp_file, shots_file)
+            
+            with open(tmp_file, 'wb') as f:
+                f.write(_json_bytes({
+                    'video_path': analysis_result.get("video_path"),
+                    'features': analysis_result.get("features"),
+                    'result': self.analyzer.result_to_json(analysis_result["result"]),
+                    'cached_at': datetime.now().isoformat()
+                }))
+            os.replace(tmp_file, cache_file)
+            (self.cache_dir / f"{cache_key}.complete").touch()
+        except Exception as e:
+            logger.warning(f"写入分析缓存失败 {cache_file}: {e}")
+    
+    def _prepare_video(self, video_path: str, features: List[str] = None,
+                       video_name: Optional[str] = None) -> Tuple[List[str], os.stat_result]:
+        """
+        校验视频文件并创建输出目录
+        
+        Args:
+            video_path: 视频文件路径
+            features: 分析功能列表
+            video_name: 已计算的视频名（文件名去扩展名），为None时计算
+        
+        Returns:
+            (实际使用的分析功能列表, 视频文件的os.stat结果)
+        """
+        # 检查文件是否存在（只stat一次，结果供校验和缓存键复用）
+        try:
+            st = os.stat(video_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"视频文件不存在: {video_path}")
+        
+        # 验证视频文件
+        if not self._validate_video_file(video_path, st):
+            raise Exception("视频文件验证失败")
+        
+        # 创建视频专用输出目录
+        video_output_dir = self.output_dir / (video_name or Path(video_path).stem)
+        self._ensure_dir(video_output_dir)
+        
+        # 设置默认分析功能 - 只使用镜头检测以提升性能
+        if not features:
+            features = ["shot_detection"]
+        
+        return features, st
+    
+    def _failure_result(self, video_name: str, error: Exception,
+                        started_at: Optional[float] = None) -> Dict[str, Any]:
+        """
+        构建处理失败结果
+        
+        不直接修改self.stats（工作进程中的修改不会回到父进程），
+        由批处理循环统一汇总错误记录。
+        """
+        error_msg = f"处理视频失败 {video_name}: {str(error)}"
+        logger.error(error_msg)
+        
+        return {
+            "success": False,
+            "video_name": video_name,
+            "error": error_msg,
+            "slices_count": 0,
+            "slices": [],
+            "processing_time": time.monotonic() - started_at if started_at else 0
+        }
+    
     def process_video(self, video_path: str, features: List[str] = None) -> Dict[str, Any]:
         """
         处理单个视频文件（并行切片优化版本）
@@ -206,112 +718,418 @@ class ParallelBatchProcessor:
         """
         video_name = Path(video_path).stem
         logger.info(f"开始处理视频: {video_name}")
+        started_at = time.monotonic()
         
         try:
-            # 检查文件是否存在
-            if not os.path.exists(video_path):
-                raise FileNotFoundError(f"视频文件不存在: {video_path}")
-            
-            # 验证视频文件
-            if not self._validate_video_file(video_path):
-                raise Exception("视频文件验证失败")
-            
-            # 创建视频专用输出目录
-            video_output_dir = self.output_dir / video_name
-            video_output_dir.mkdir(exist_ok=True)
-            
-            # 设置默认分析功能 - 只使用镜头检测以提升性能
-            if not features:
-                features = ["shot_detection"]
-            
-            # 分析视频
-            logger.info(f"分析视频内容: {video_name}")
-            analysis_result = self.analyzer.analyze_video(
-                video_path=video_path,
-                features=features,
-                auto_cleanup_storage=True
-            )
+            features, st = self._prepare_video(video_path, features, video_name)
             
-            if not analysis_result.get("success"):
-                error_msg = analysis_result.get("error", "分析失败")
-                raise Exception(f"视频分析失败: {error_msg}")
+            # 分析视频（优先使用缓存）
+            cache_key = self._analysis_cache_key(video_path, features, st)
+            analysis_result = self._load_cached_analysis(cache_key)
+            if analysis_result:
+                logger.info(f"使用缓存的分析结果: {video_name}")
+            else:
+                logger.info(f"分析视频内容: {video_name}")
+                analysis_result = self.analyzer.analyze_video(
+                    video_path=video_path,
+                    features=features,
+                    auto_cleanup_storage=True
+                )
+                self._store_cached_analysis(cache_key, analysis_result)
+            
+            return self._slice_analyzed_video(video_path, features, analysis_result, started_at)
             
-            # 提取镜头信息
-            shots = self.analyzer.extract_shots(analysis_result)
+        except Exception as e:
+            return self._failure_result(video_name, e, started_at)
+    
+    def _slice_analyzed_video(self, video_path: str, features: List[str],
+                              analysis_result: Dict[str, Any],
+                              started_at: Optional[float] = None,
+                              shots: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        根据分析结果生成视频切片并保存切片信息
+        
+        Args:
+            video_path: 视频文件路径
+            features: 分析功能列表
+            analysis_result: GoogleVideoAnalyzer的分析结果
+            started_at: 开始处理的time.monotonic()时间，用于计算耗时
+            shots: 已确定的镜头列表（为None时从分析结果中提取，
+                   仍为空时生成默认分割；须在没有运行中事件循环的线程调用）
+            
+        Returns:
+            处理结果
+        """
+        video_name = Path(video_path).stem
+        video_output_dir = self.output_dir / video_name
+        
+        if not analysis_result.get("success"):
+            error_msg = analysis_result.get("error", "分析失败")
+            raise Exception(f"视频分析失败: {error_msg}")
+        
+        # 提取镜头信息（异步流水线已在事件循环中确定镜头，同步调用时在此补全）
+        if shots is None:
+            shots = analysis_result.get("shots")
+            if shots is None:
+                shots = self.analyzer.extract_shots(analysis_result)
             if not shots:
                 logger.warning(f"未检测到镜头，使用默认分割方案: {video_name}")
-                shots = self._create_default_shots(video_path)
+                shots = asyncio.run(self._create_default_shots(
+                    video_path, duration=self.analyzer.extract_duration(analysis_result)
+                ))
+        
+        shots = _merge_short_shots(shots, self.min_shot_duration)
+        
+        logger.info(f"检测到 {len(shots)} 个镜头")
+        
+        # 🚀 关键优化：使用并行切片器生成视频切片
+        logger.info(f"开始并行生成视频切片: {video_name}")
+        
+        def progress_callback(progress, message):
+            logger.info(f"切片进度 {progress}%: {message}")
+        
+        slice_results = self.parallel_slicer.create_slices_from_shots(
+            video_path=video_path,
+            shots=shots,
+            video_name=video_name,
+            output_dir=str(self.output_dir),
+            progress_callback=progress_callback
+        )
+        
+        # 验证切片质量
+        quality_result = self._validate_slice_quality(slice_results, video_name)
+        
+        if not quality_result["passed"]:
+            logger.warning(f"切片质量不符合标准: {quality_result['error']}")
+        
+        processing_time = time.monotonic() - started_at if started_at else 0
+        
+        # 保存切片信息
+        slice_info_file = video_output_dir / f"{video_name}_slices.json"
+        with open(slice_info_file, 'wb') as f:
+            f.write(_json_bytes({
+                'video_name': video_name,
+                'video_path': video_path,
+                'analysis_features': features,
+                'total_shots': len(shots),
+                'successful_slices': len(slice_results),
+                'quality_check': quality_result,
+                'slices': slice_results,
+                'processing_time': processing_time
+            }, indent=True))
+        
+        logger.info(f"视频处理完成: {video_name}，生成 {len(slice_results)} 个切片")
+        
+        return {
+            "success": True,
+            "video_name": video_name,
+            "slices_count": len(slice_results),
+            "slices": slice_results,
+            "quality_check": quality_result,
+            "output_dir": str(video_output_dir),
+            "processing_time": processing_time
+        }
+    
+    async def _pipeline_process_video(self, video_path: str, features: List[str] = None) -> Dict[str, Any]:
+        """
+        流水线处理单个视频：异步等待API分析，切片交给线程池
+        
+        上传与在途API分析请求分别限流，切片期间释放名额，
+        使下一个视频的上传、分析与当前视频的FFmpeg切片重叠进行。
+        """
+        video_name = Path(video_path).stem
+        logger.info(f"开始处理视频: {video_name}")
+        started_at = time.monotonic()
+        
+        try:
+            features, st = self._prepare_video(video_path, features, video_name)
             
-            logger.info(f"检测到 {len(shots)} 个镜头")
+            loop = asyncio.get_running_loop()
+            cache_key = self._analysis_cache_key(video_path, features, st)
+            analysis_result = await loop.run_in_executor(
+                self._thread_pool, self._load_cached_analysis, cache_key
+            )
+            if analysis_result:
+                logger.info(f"使用缓存的分析结果: {video_name}")
+            else:
+                logger.info(f"分析视频内容: {video_name}")
+                # 等待云端分析期间并行探测切片所需的关键帧
+                prefetch = loop.run_in_executor(
+                    self._thread_pool, self.parallel_slicer.prefetch_keyframes, video_path
+                )
+                try:
+                    analysis_result = await self.analyzer.analyze_video_async(
+                        video_path=video_path,
+                        features=features,
+                        auto_cleanup_storage=True,
+                        upload_semaphore=self.upload_semaphore,
+                        request_semaphore=self.semaphore  # 限制在途API请求数
+                    )
+                finally:
+                    await prefetch
+                await loop.run_in_executor(
+                    self._thread_pool, self._store_cached_analysis, cache_key, analysis_result
+                )
             
-            # 🚀 关键优化：使用并行切片器生成视频切片
-            logger.info(f"开始并行生成视频切片: {video_name}")
+            shots = await self._resolve_shots(video_path, analysis_result)
+            return await loop.run_in_executor(
+                self._thread_pool,
+                self._slice_analyzed_video,
+                video_path,
+                features,
+                analysis_result,
+                started_at,
+                shots
+            )
             
-            def progress_callback(progress, message):
-                logger.info(f"切片进度 {progress}%: {message}")
+        except Exception as e:
+            return self._failure_result(video_name, e, started_at)
+    
+    async def _group_short_videos(self, video_files: List[str]) -> Tuple[List[List[Tuple[str, float]]], List[str]]:
+        """
+        将短视频按总时长分组，用于合并后一次提交分析
+        
+        仅在线程模式且设置了concat_short_seconds时启用；只有流参数签名完全相同的视频才分到同一组
+        （参数不一致时流复制合并会产生解码错误或时间戳漂移，镜头也会被分配到错误的视频），
+        不足两个视频的组按单个视频处理。
+        
+        Returns:
+            (短视频分组列表[(路径, 时长)], 单独处理的视频列表)
+        """
+        if self.concat_short_seconds <= 0 or self.workers > 0:
+            return [], list(video_files)
+        
+        # 一次性批量获取时长并写入缓存，后续默认切片回退直接查缓存
+        durations = await self._probe_durations(video_files)
+        
+        candidates, single_videos = [], []
+        for video_file in video_files:
+            duration = durations[str(video_file)]
+            if not duration or duration >= self.concat_short_seconds:
+                single_videos.append(video_file)
+            else:
+                candidates.append((str(video_file), duration))
+        signatures = await self._probe_stream_signatures([path for path, _ in candidates])
+        
+        # 每种流参数签名各自累积一组，超过总时长上限时另起一组
+        groups = []
+        open_groups: Dict[Tuple[str, ...], List[Tuple[str, float]]] = {}
+        for path, duration in candidates:
+            signature = signatures[path]
+            if signature is None:
+                single_videos.append(path)
+                continue
+            current = open_groups.get(signature)
+            if current and sum(d for _, d in current) + duration > self.concat_group_seconds:
+                groups.append(current)
+                current = None
+            if current is None:
+                current = open_groups[signature] = []
+            current.append((path, duration))
+        groups.extend(open_groups.values())
+        
+        for group in [g for g in groups if len(g) < 2]:
+            groups.remove(group)
+            single_videos.extend(path for path, _ in group)
+        
+        if groups:
+            logger.info(f"🧩 {sum(len(g) for g in groups)} 个短视频合并为 {len(groups)} 组提交分析")
+        return groups, single_videos
+    
+    def _concat_videos(self, video_paths: List[str]) -> str:
+        """
+        使用FFmpeg concat分离器流复制合并视频（调用方保证各视频流参数签名一致）
+        
+        Args:
+            video_paths: 待合并视频路径列表
             
-            slice_results = self.parallel_slicer.create_slices_from_shots(
-                video_path=video_path,
-                shots=shots,
-                video_name=video_name,
-                output_dir=str(self.output_dir),
-                progress_callback=progress_callback
+        Returns:
+            合并后的视频路径
+        """
+        list_file = self.temp_dir / f"concat_{uuid.uuid4().hex[:8]}.txt"
+        output_file = self.temp_dir / f"{list_file.stem}.mp4"
+        
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for video_path in video_paths:
+                escaped = os.path.abspath(video_path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        
+        try:
+            result = subprocess.run(
+                ["ffmpeg", "-y", "-hide_banner", "-nostats", "-loglevel", "error",
+                 "-f", "concat", "-safe", "0", "-i", str(list_file),
+                 "-c", "copy", str(output_file)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=600
             )
+        finally:
+            list_file.unlink(missing_ok=True)
+        
+        if result.returncode != 0 or not output_file.exists():
+            output_file.unlink(missing_ok=True)
+            raise Exception(f"合并短视频失败: {result.stderr[-300:]}")
+        
+        return str(output_file)
+    
+    def _shots_in_range(self, shots: List[Dict[str, Any]], offset: float,
+                        duration: float) -> List[Dict[str, Any]]:
+        """截取合并视频中属于某个原视频的镜头，并换算为原视频时间"""
+        end = offset + duration
+        clipped = []
+        for shot in shots:
+            start_time = max(shot['start_time'], offset)
+            end_time = min(shot['end_time'], end)
+            if end_time - start_time <= 0.05:
+                continue
             
-            # 验证切片质量
-            quality_result = self._validate_slice_quality(slice_results, video_name)
-            
-            if not quality_result["passed"]:
-                logger.warning(f"切片质量不符合标准: {quality_result['error']}")
+            index = len(clipped) + 1
+            clipped.append({
+                **shot,
+                'index': index,
+                'start_time': start_time - offset,
+                'end_time': end_time - offset,
+                'duration': end_time - start_time,
+                'type': f"镜头{index}"
+            })
+        return clipped
+    
+    async def _process_short_group(self, group: List[Tuple[str, float]],
+                                   features: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        合并一组短视频后只调用一次分析API，再按原视频边界拆分镜头并分别切片
+        
+        合并或分析失败时回退为逐个视频处理。
+        
+        Args:
+            group: [(视频路径, 时长)] 列表
+            features: 分析功能列表
             
-            # 保存切片信息
-            slice_info_file = video_output_dir / f"{video_name}_slices.json"
-            with open(slice_info_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'video_name': video_name,
-                    'video_path': video_path,
-                    'analysis_features': features,
-                    'total_shots': len(shots),
-                    'successful_slices': len(slice_results),
-                    'quality_check': quality_result,
-                    'slices': slice_results,
-                    'processing_time': datetime.now().isoformat()
-                }, f, ensure_ascii=False, indent=2)
+        Returns:
+            组内每个视频的处理结果列表
+        """
+        loop = asyncio.get_running_loop()
+        started_at = time.monotonic()
+        group_video = None
+        
+        try:
+            for video_path, _ in group:
+                features, _ = self._prepare_video(video_path, features)
             
-            # 更新统计
-            self.stats["total_slices"] += len(slice_results)
+            group_video = await loop.run_in_executor(
+                self._thread_pool, self._concat_videos, [p for p, _ in group]
+            )
             
-            logger.info(f"视频处理完成: {video_name}，生成 {len(slice_results)} 个切片")
+            logger.info(f"分析合并视频: {len(group)} 个短视频")
+            analysis_result = await self.analyzer.analyze_video_async(
+                video_path=group_video,
+                features=features,
+                auto_cleanup_storage=True,
+                upload_semaphore=self.upload_semaphore,
+                request_semaphore=self.semaphore  # 限制在途API请求数
+            )
+            if not analysis_result.get("success"):
+                raise Exception(analysis_result.get("error", "分析失败"))
             
-            return {
-                "success": True,
-                "video_name": video_name,
-                "slices_count": len(slice_results),
-                "slices": slice_results,
-                "quality_check": quality_result,
-                "output_dir": str(video_output_dir)
-            }
+            group_shots = self.analyzer.extract_shots(analysis_result)
             
         except Exception as e:
-            error_msg = f"处理视频失败 {video_name}: {str(e)}"
-            logger.error(error_msg)
-            self.stats["processing_errors"].append({
-                "video": video_name,
-                "error": error_msg
-            })
+            logger.warning(f"短视频合并分析失败，改为逐个处理: {e}")
+            # 合并请求被限流时同样收紧并发上限
+            await self._adjust_concurrency({"success": False, "error": str(e)})
+            return list(await asyncio.gather(*(
+                self.async_process_video(video_path, features) for video_path, _ in group
+            )))
+        finally:
+            if group_video:
+                Path(group_video).unlink(missing_ok=True)
+        
+        # 合并和分析的耗时由组内视频平分，每个视频再加上自己的切片耗时，
+        # 避免共享耗时在串行耗时估计中被重复计入
+        shared_time = (time.monotonic() - started_at) / len(group)
+        
+        # 按各视频在合并文件中的偏移拆分镜头，无镜头的视频使用默认分割
+        slice_tasks = []
+        offset = 0.0
+        for video_path, duration in group:
+            shots = self._shots_in_range(group_shots, offset, duration)
+            offset += duration
+            slice_tasks.append(self._slice_short_video(video_path, features, analysis_result,
+                                                       shared_time, shots or None))
+        
+        results = await asyncio.gather(*slice_tasks)
+        duration = time.monotonic() - started_at
+        return [await self._account_result(Path(video_path).stem, result, duration)
+                for (video_path, _), result in zip(group, results)]
+    
+    async def _slice_short_video(self, video_path: str, features: List[str],
+                                 analysis_result: Dict[str, Any], shared_time: float,
+                                 shots: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        在线程池中切片合并分析组内的单个视频
+        
+        结果中的processing_time为 分摊到该视频的合并分析耗时(shared_time) + 该视频自身的切片耗时。
+        """
+        loop = asyncio.get_running_loop()
+        started_at = time.monotonic() - shared_time
+        
+        def slice_video() -> Dict[str, Any]:
+            # 在工作线程开始执行时计时，不计线程池排队时间
+            return self._slice_analyzed_video(video_path, features, analysis_result,
+                                              time.monotonic() - shared_time, shots)
+        
+        try:
+            # 组内没有镜头落在该视频范围时使用默认分割，而不是整组的镜头
+            shots = shots or await self._create_default_shots(video_path)
+            return await loop.run_in_executor(self._thread_pool, slice_video)
+        except Exception as e:
+            return self._failure_result(Path(video_path).stem, e, started_at)
+    
+    async def _adjust_concurrency(self, result: Dict[str, Any]) -> None:
+        """
+        根据处理结果自适应调整API并发上限
+        
+        配额限流（429 / RESOURCE_EXHAUSTED）时上限减半，
+        连续成功CONCURRENCY_RECOVERY_SUCCESSES次后上限加一，不超过max_concurrent。
+        """
+        limiter = self.semaphore
+        if result.get("success"):
+            self._consecutive_successes += 1
+            if (self._consecutive_successes >= CONCURRENCY_RECOVERY_SUCCESSES
+                    and limiter.limit < self.max_concurrent):
+                self._consecutive_successes = 0
+                await limiter.set_limit(limiter.limit + 1)
+                logger.info(f"API并发上限恢复为 {limiter.limit}")
+            return
+        
+        self._consecutive_successes = 0
+        error = str(result.get("error", ""))
+        if ("429" in error or "RESOURCE_EXHAUSTED" in error.upper()) and limiter.limit > 1:
+            await limiter.set_limit(limiter.limit // 2)
+            logger.warning(f"⚠️ API配额受限，并发上限降为 {limiter.limit}")
+    
+    async def _account_result(self, video_name: str, result: Dict[str, Any],
+                              duration: float) -> Dict[str, Any]:
+        """
+        单个视频结果的统一收尾：补全耗时、反馈给自适应并发控制并输出日志
+        
+        Args:
+            video_name: 视频名
+            result: 处理结果字典
+            duration: 本次处理总耗时（秒）
             
-            return {
-                "success": False,
-                "video_name": video_name,
-                "error": error_msg,
-                "slices_count": 0,
-                "slices": []
-            }
+        Returns:
+            补全后的处理结果字典
+        """
+        # 优先保留处理过程实测的耗时（不含排队等待），缺失时用本次总耗时
+        result.setdefault("processing_time", duration)
+        await self._adjust_concurrency(result)
+        
+        if result.get("success"):
+            logger.info(f"✅ 视频处理完成: {video_name} ({duration:.1f}秒)")
+        else:
+            logger.error(f"❌ 视频处理失败: {video_name}")
+        
+        return result
     
-    @retry(
-        wait=wait_random_exponential(multiplier=1, max=120),
-        stop=stop_after_attempt(3)
-    )
     async def async_process_video(self, video_path: str, features: List[str] = None) -> Dict[str, Any]:
         """
         异步处理单个视频文件
@@ -323,42 +1141,34 @@ class ParallelBatchProcessor:
         Returns:
             处理结果字典
         """
-        async with self.semaphore:  # 限制并发数
-            video_name = Path(video_path).stem
+        video_name = Path(video_path).stem
+        
+        try:
+            logger.info(f"🎬 开始异步处理视频: {video_name}")
+            start_time = time.monotonic()
             
-            try:
-                logger.info(f"🎬 开始异步处理视频: {video_name}")
-                start_time = time.time()
-                
-                # 使用线程池执行同步的视频处理
-                loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(
-                    None, 
-                    self.process_video, 
-                    video_path, 
-                    features
-                )
-                
-                end_time = time.time()
-                duration = end_time - start_time
-                
-                if result.get("success"):
-                    logger.info(f"✅ 视频处理完成: {video_name} ({duration:.1f}秒)")
-                else:
-                    logger.error(f"❌ 视频处理失败: {video_name}")
-                
-                return result
-                
-            except Exception as e:
-                error_msg = f"异步处理视频失败 {video_name}: {str(e)}"
-                logger.error(error_msg)
-                return {
-                    "success": False,
-                    "video_name": video_name,
-                    "error": error_msg,
-                    "slices_count": 0,
-                    "slices": []
-                }
+            if self._process_pool:
+                async with self.semaphore:  # 限制并发数
+                    # 使用进程池执行，工作进程自行构建分析器和切片器
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(
+                        self._process_pool, self._worker_fn, video_path, features
+                    )
+            else:
+                result = await self._pipeline_process_video(video_path, features)
+            
+            return await self._account_result(video_name, result, time.monotonic() - start_time)
+            
+        except Exception as e:
+            error_msg = f"异步处理视频失败 {video_name}: {str(e)}"
+            logger.error(error_msg)
+            return {
+                "success": False,
+                "video_name": video_name,
+                "error": error_msg,
+                "slices_count": 0,
+                "slices": []
+            }
     
     async def parallel_batch_process(self, video_files: List[str], 
                                    features: List[str] = None,
@@ -375,107 +1185,213 @@ class ParallelBatchProcessor:
             批处理结果
         """
         total_videos = len(video_files)
-        self.stats["total_videos"] = total_videos
+        self.stats.total_videos = total_videos
         
         logger.info(f"🚀 开始并行处理 {total_videos} 个视频文件 (最大并发: {self.max_concurrent})")
         
         if progress_callback:
             progress_callback(0, f"开始并行处理 {total_videos} 个视频...")
         
-        start_time = time.time()
+        if self.workers > 0:
+            # 父进程已有gRPC通道和后台线程，fork后子进程可能死锁；用spawn启动全新的解释器，
+            # 工作进程自行构建_WORKER_PROCESSOR
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            # 批次内不变的参数预先绑定，每次派发只传视频路径和功能列表
+            self._worker_fn = functools.partial(
+                _process_video_worker,
+                output_dir=str(self.output_dir),
+                temp_dir=str(self.temp_dir),
+                ffmpeg_workers=self.ffmpeg_workers,
+                use_cache=self.use_cache,
+                min_shot_duration=self.min_shot_duration
+            )
+            logger.info(f"使用进程池处理视频 - 工作进程数: {self.workers}")
+        else:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.max_concurrent,
+                                                   thread_name_prefix="vidproc")
+        
+        try:
+            # 预先一次性创建所有视频的输出目录，处理单个视频时不再mkdir
+            await asyncio.get_running_loop().run_in_executor(
+                self._thread_pool, self._create_output_dirs, video_files
+            )
+            return await self._run_batch(video_files, features, progress_callback)
+        finally:
+            await self.aclose()
+    
+    async def aclose(self):
+        """释放批处理期间持有的客户端和工作池"""
+        # 所有视频协程共用一个异步客户端，批处理结束后在同一事件循环内关闭
+        await self.analyzer.aclose()
+        # 等待工作池退出会阻塞，放到线程中执行，不卡住事件循环
+        if self._thread_pool:
+            await asyncio.to_thread(self._thread_pool.shutdown, wait=True)
+            self._thread_pool = None
+        if self._process_pool:
+            await asyncio.to_thread(self._process_pool.shutdown, wait=True)
+            self._process_pool = None
+    
+    async def _run_batch(self, video_files: List[str], features: List[str] = None,
+                         progress_callback: Optional[callable] = None) -> Dict[str, Any]:
+        """执行批处理任务并生成报告"""
+        total_videos = len(video_files)
+        start_time = time.monotonic()
+        
+        # 惰性生成待处理任务（启用时先把短视频合并成组，每组只调用一次API）
+        groups, single_videos = await self._group_short_videos(video_files)
+        work = itertools.chain(
+            (self.async_process_video(str(video_file), features) for video_file in single_videos),
+            (self._process_short_group(group, features) for group in groups)
+        )
+        
+        # 滑动窗口：同时只保留 2×并发数 个在途任务，完成一个再补充一个，
+        # 内存中的协程数量与批次大小无关；
+        # 每个结果完成即追加写入NDJSON，不在内存中保留全部结果
+        window = 2 * max(self.max_concurrent, self.workers)
+        pending = set()
         
-        # 创建异步任务列表
-        tasks = []
-        for i, video_file in enumerate(video_files):
-            task = self.async_process_video(str(video_file), features)
-            tasks.append(task)
+        def fill_window():
+            while len(pending) < window:
+                coro = next(work, None)
+                if coro is None:
+                    break
+                pending.add(asyncio.ensure_future(coro))
         
-        # 并行执行所有任务，使用as_completed获取进度
-        results = []
+        results_file = self.output_dir / "parallel_batch_results.ndjson"
+        results_ndjson = open(results_file, 'wb')
         completed = 0
+        processed = failed = total_slices = 0
+        seq_total = 0.0  # 各视频实际处理耗时之和，即串行处理的估计耗时
+        # 进度回调和日志限速：最多每0.25秒输出一次，最后一个视频总是输出
+        last_emit = 0.0
+        progress_template = "已完成 {}/{} 个视频 (成功: {}, 失败: {})"
         
-        for coro in asyncio.as_completed(tasks):
-            try:
-                result = await coro
-                results.append(result)
-                completed += 1
-                
-                # 更新统计信息
-                if result.get("success"):
-                    self.stats["processed_videos"] += 1
-                    self.stats["total_slices"] += result.get("slices_count", 0)
-                else:
-                    self.stats["failed_videos"] += 1
-                    self.stats["processing_errors"].append({
-                        "video": result.get("video_name", "unknown"),
-                        "error": result.get("error", "unknown error")
-                    })
-                
-                # 进度回调
-                progress = int((completed / total_videos) * 100)
-                if progress_callback:
-                    progress_callback(
-                        progress, 
-                        f"已完成 {completed}/{total_videos} 个视频 "
-                        f"(成功: {self.stats['processed_videos']}, "
-                        f"失败: {self.stats['failed_videos']})"
-                    )
-                
-                logger.info(f"📊 进度: {completed}/{total_videos} ({progress}%)")
-                
-            except Exception as e:
-                logger.error(f"处理任务时发生异常: {e}")
-                results.append({
-                    "success": False,
-                    "video_name": "unknown",
-                    "error": str(e),
-                    "slices_count": 0,
-                    "slices": []
-                })
-                completed += 1
+        def record(result: Dict[str, Any]):
+            # 只写入缓冲区，随进度输出一起刷新，避免每个视频一次write系统调用
+            results_ndjson.write(_json_bytes(result) + b"\n")
+        
+        # 内存中只保留最近的错误，溢出的旧错误追加到旁路文件
+        errors_file = self.output_dir / "parallel_batch_errors.ndjson"
+        errors_ndjson = None
+        
+        def record_error(error: Dict[str, str]):
+            nonlocal errors_ndjson
+            processing_errors = self.stats.processing_errors
+            if len(processing_errors) == processing_errors.maxlen:
+                if errors_ndjson is None:
+                    errors_ndjson = open(errors_file, 'wb')
+                errors_ndjson.write(_json_bytes(processing_errors[0]) + b"\n")
+            processing_errors.append(error)
+        
+        try:
+            fill_window()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                fill_window()
+                for task in done:
+                    try:
+                        outcome = task.result()
+                    except Exception as e:
+                        logger.error(f"处理任务时发生异常: {e}")
+                        record({
+                            "success": False,
+                            "video_name": "unknown",
+                            "error": str(e),
+                            "slices_count": 0,
+                            "slices": []
+                        })
+                        completed += 1
+                        failed += 1
+                        continue
+                    
+                    # 短视频合并分析的任务一次返回多个视频的结果
+                    for result in (outcome if isinstance(outcome, list) else [outcome]):
+                        record(result)
+                        completed += 1
+                        
+                        # 累计到局部计数，批次结束后一次性写入统计信息
+                        if result.get("success"):
+                            processed += 1
+                            seq_total += result.get('processing_time', 0.0)
+                            total_slices += result.get("slices_count", 0)
+                        else:
+                            failed += 1
+                            record_error({
+                                "video": result.get("video_name", "unknown"),
+                                "error": result.get("error", "unknown error")
+                            })
+                        
+                        now = time.monotonic()
+                        if now - last_emit < 0.25 and completed != total_videos:
+                            continue
+                        last_emit = now
+                        results_ndjson.flush()
+                        
+                        # 进度回调
+                        progress = int((completed / total_videos) * 100)
+                        if progress_callback:
+                            progress_callback(
+                                progress,
+                                progress_template.format(completed, total_videos, processed, failed)
+                            )
+                        
+                        logger.info("📊 进度: %d/%d (%d%%)", completed, total_videos, progress)
+        finally:
+            for task in pending:
+                task.cancel()
+            # 等待被取消的任务真正结束后再关闭结果文件，避免任务仍在写入时关闭
+            await asyncio.gather(*pending, return_exceptions=True)
+            results_ndjson.close()
+            if errors_ndjson is not None:
+                errors_ndjson.close()
         
-        end_time = time.time()
-        total_duration = end_time - start_time
+        total_duration = time.monotonic() - start_time
+        self.stats.processed_videos += processed
+        self.stats.failed_videos += failed
+        self.stats.total_slices += total_slices
+        batch_stats = self.stats.to_dict()
         
         # 生成详细报告
         report_data = {
-            'batch_stats': self.stats.copy(),
-            'processing_results': results,
+            'batch_stats': batch_stats,
+            'results_file': str(results_file),
+            'errors_overflow_file': str(errors_file) if errors_ndjson is not None else None,
             'parallel_info': {
                 'max_concurrent': self.max_concurrent,
                 'total_duration_seconds': total_duration,
                 'average_time_per_video': total_duration / total_videos if total_videos > 0 else 0,
-                'estimated_sequential_time': sum([r.get('processing_time', 94) for r in results if r.get('success')]),
-                'time_saved_percentage': 0
+                'estimated_sequential_time': seq_total,
+                'time_saved_percentage': (
+                    max(0.0, (seq_total - total_duration) / seq_total * 100) if seq_total else 0.0
+                )
             },
             'generated_at': datetime.now().isoformat()
         }
         
-        # 计算时间节省
-        estimated_sequential = report_data['parallel_info']['estimated_sequential_time']
-        if estimated_sequential > 0:
-            time_saved = max(0, (estimated_sequential - total_duration) / estimated_sequential * 100)
-            report_data['parallel_info']['time_saved_percentage'] = time_saved
-        
-        # 保存报告
+        # 保存报告（序列化和写盘放到线程池，不阻塞事件循环）
         report_file = self.output_dir / "parallel_batch_processing_report.json"
-        with open(report_file, 'w', encoding='utf-8') as f:
-            json.dump(report_data, f, ensure_ascii=False, indent=2)
+        await asyncio.get_running_loop().run_in_executor(
+            self._thread_pool,
+            lambda: report_file.write_bytes(_json_bytes(report_data, indent=True))
+        )
         
         logger.info(f"🎉 并行批处理完成!")
-        logger.info(f"📊 处理统计: 成功 {self.stats['processed_videos']}/{total_videos} 个视频")
-        logger.info(f"🎬 总计生成: {self.stats['total_slices']} 个视频切片")
+        logger.info(f"📊 处理统计: 成功 {self.stats.processed_videos}/{total_videos} 个视频")
+        logger.info(f"🎬 总计生成: {self.stats.total_slices} 个视频切片")
         logger.info(f"⏱️  总耗时: {total_duration:.1f}秒")
         logger.info(f"📄 详细报告: {report_file}")
+        logger.info(f"📄 逐视频结果: {results_file}")
         
         if report_data['parallel_info']['time_saved_percentage'] > 0:
             logger.info(f"🚀 性能提升: 节省了 {report_data['parallel_info']['time_saved_percentage']:.1f}% 的时间!")
         
         return {
             "success": True,
-            "stats": self.stats,
-            "results": results,
+            "stats": batch_stats,
             "report_file": str(report_file),
+            "results_file": str(results_file),
             "total_duration": total_duration,
             "parallel_info": report_data['parallel_info']
         }
@@ -494,9 +1410,6 @@ class ParallelBatchProcessor:
             批处理结果
         """
         # 查找视频文件
-        if not file_patterns:
-            file_patterns = ["*.mp4", "*.avi", "*.mov", "*.mkv", "*.wmv", "*.flv"]
-        
         video_files = []
         input_path = Path(input_dir)
         
@@ -504,8 +1417,24 @@ class ParallelBatchProcessor:
             logger.error(f"输入目录不存在: {input_dir}")
             return {"success": False, "error": f"输入目录不存在: {input_dir}"}
         
-        for pattern in file_patterns:
-            video_files.extend(input_path.glob(pattern))
+        # 单次扫描目录：未指定模式时按VALID_EXTS匹配；
+        # 简单的 "*.ext" 模式按扩展名集合匹配，其余模式用fnmatch
+        if file_patterns:
+            extensions = {p[1:].lower() for p in file_patterns if p.startswith("*.") and "*" not in p[1:]}
+            other_patterns = [p for p in file_patterns if p[1:].lower() not in extensions]
+        else:
+            extensions = VALID_EXTS
+            other_patterns = []
+        
+        with os.scandir(input_path) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if (os.path.splitext(entry.name)[1].lower() in extensions
+                        or any(fnmatch.fnmatch(entry.name, p) for p in other_patterns)):
+                    video_files.append(Path(entry.path))
+        
+        video_files.sort()
         
         if not video_files:
             logger.warning(f"在目录 {input_dir} 中未找到任何视频文件")
@@ -521,6 +1450,43 @@ class ParallelBatchProcessor:
         )
 
 
+# 工作进程内的处理器实例（每个进程独立构建，不跨进程共享客户端）
+_WORKER_PROCESSOR: Optional[ParallelBatchProcessor] = None
+
+
+def _process_video_worker(video_path: str, features: List[str] = None, *,
+                          output_dir: str, temp_dir: str, ffmpeg_workers: int = 0,
+                          use_cache: bool = True, min_shot_duration: float = 0) -> Dict[str, Any]:
+    """
+    进程池工作函数：在工作进程中处理单个视频
+    
+    Args:
+        video_path: 视频文件路径
+        features: 分析功能列表
+        output_dir: 输出目录
+        temp_dir: 临时目录
+        ffmpeg_workers: FFmpeg并行切片进程数（0为自动）
+        use_cache: 是否使用分析结果缓存
+        min_shot_duration: 最短镜头时长（秒，0为不合并）
+        
+    Returns:
+        处理结果字典
+    """
+    global _WORKER_PROCESSOR
+    
+    configure_logging()
+    if _WORKER_PROCESSOR is None:
+        _WORKER_PROCESSOR = ParallelBatchProcessor(
+            output_dir=output_dir,
+            temp_dir=temp_dir,
+            max_concurrent=1,
+            ffmpeg_workers=ffmpeg_workers,
+            use_cache=use_cache,
+            min_shot_duration=min_shot_duration
+        )
+    return _WORKER_PROCESSOR.process_video(video_path, features)
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description="AI Video Master 5.0 - 并行批量视频切片工具")
@@ -533,8 +1499,16 @@ def main():
                        help="分析功能 (默认仅镜头检测，性能最佳)")
     parser.add_argument("-c", "--concurrent", type=int, default=3,
                        help="视频级最大并发数 (默认3，建议不超过3以遵循API配额)")
-    parser.add_argument("-w", "--ffmpeg-workers", type=int, default=4,
-                       help="FFmpeg并行切片工作线程数 (默认4，建议2-8)")
+    parser.add_argument("-w", "--ffmpeg-workers", type=int, default=0,
+                       help="FFmpeg并行切片进程数 (默认0，按CPU核心数自动计算)")
+    parser.add_argument("--workers", type=int, default=0,
+                       help="视频级工作进程数 (默认0，使用线程；上限为CPU核心数)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="忽略已缓存的视频分析结果，重新调用API")
+    parser.add_argument("--concat-short", type=float, default=0,
+                       help="短于该秒数的视频合并后一次提交分析 (默认0，不合并；要求编码参数一致)")
+    parser.add_argument("--min-shot-duration", type=float, default=0,
+                       help="短于该秒数的镜头并入相邻镜头 (默认0，不合并；会改变切片边界和数量)")
     parser.add_argument("--patterns", nargs="+", 
                        default=["*.mp4", "*.avi", "*.mov", "*.mkv"],
                        help="文件匹配模式")
@@ -559,7 +1533,11 @@ def main():
             output_dir=args.output,
             temp_dir=args.temp,
             max_concurrent=args.concurrent,
-            ffmpeg_workers=args.ffmpeg_workers
+            ffmpeg_workers=args.ffmpeg_workers,
+            workers=args.workers,
+            use_cache=not args.no_cache,
+            concat_short_seconds=args.concat_short,
+            min_shot_duration=args.min_shot_duration
         )
         
         # 执行并行批处理
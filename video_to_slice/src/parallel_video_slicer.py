@@ -11,38 +11,429 @@
 """
 
 import os
+import atexit
+import bisect
+import itertools
 import logging
+import signal
 import subprocess
+import tempfile
+import threading
 import asyncio
 import time
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache, partial
+from typing import Optional, Dict, Any, Callable, Iterator, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 切片文件名模板
+SEGMENT_FILENAME_TEMPLATE = "{video_id}_semantic_seg_{index}_{semantic_type}.mp4"
+STREAM_SEGMENT_TEMPLATE = "{video_id}_stream_seg_{index:03d}.mp4"
+
+# FFmpeg只输出错误信息：省去每个进程几十KB的版本横幅和统计输出的管道传输与解码
+FFMPEG_QUIET_ARGS = ("-hide_banner", "-nostats", "-loglevel", "error")
+
+# MP4/MKV等容器的流参数在文件头/索引中，无需默认的5MB/5秒探测；TS等裸流仍用默认值
+FAST_PROBE_SUFFIXES = frozenset({".mp4", ".m4v", ".mov", ".mkv", ".webm"})
+FFMPEG_FAST_PROBE_ARGS = ("-probesize", "500000", "-analyzeduration", "500000", "-fflags", "+nobuffer")
+
+
+# 运行中的FFmpeg进程组（每个FFmpeg在独立会话中启动，进程组ID即其PID），解释器退出时统一终止
+_LIVE_PROCESS_GROUPS: set = set()
+
+
+def _kill_process_group(pid: int) -> None:
+    """终止以pid为组长的整个进程组，释放其占用的CPU（不支持进程组的平台只终止该进程）"""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(pid, signal.SIGKILL)
+        else:
+            os.kill(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _kill_live_process_groups() -> None:
+    """解释器退出时终止仍在运行的FFmpeg进程组"""
+    for pid in list(_LIVE_PROCESS_GROUPS):
+        _kill_process_group(pid)
+
+
+atexit.register(_kill_live_process_groups)
+
+
+def _input_probe_args(video_path: str) -> Tuple[str, ...]:
+    """返回放在 -i 之前的输入探测参数：容器自带索引时缩小探测量，其他格式保持默认"""
+    if os.path.splitext(str(video_path))[1].lower() in FAST_PROBE_SUFFIXES:
+        return FFMPEG_FAST_PROBE_ARGS
+    return ()
+
+
+def _segment_timeout(duration: float) -> float:
+    """按片段时长确定FFmpeg超时时间（秒）"""
+    return max(30.0, 5 * duration)
+
+
+def _run_ffmpeg(cmd: List[str], timeout: float,
+                preexec_fn: Optional[Callable[[], None]] = None) -> Tuple[int, str]:
+    """
+    在独立进程组中运行FFmpeg，返回 (返回码, stderr文本)
+    
+    超时或被中断时终止整个进程组并等待回收，再向上抛出异常（超时为subprocess.TimeoutExpired）。
+    preexec_fn 在子进程exec之前执行（用于CPU绑定）。
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               text=True, errors='replace', start_new_session=True,
+                               preexec_fn=preexec_fn)
+    _LIVE_PROCESS_GROUPS.add(process.pid)
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except BaseException:
+        _kill_process_group(process.pid)
+        process.communicate()
+        raise
+    finally:
+        _LIVE_PROCESS_GROUPS.discard(process.pid)
+    return process.returncode, stderr
+
+
+def _run_ffmpeg_to_memory(cmd: List[str], timeout: float,
+                          preexec_fn: Optional[Callable[[], None]] = None
+                          ) -> Tuple[int, bytes, str]:
+    """
+    在独立进程组中运行输出到stdout的FFmpeg，返回 (返回码, 输出字节, stderr文本)
+    
+    超时或被中断时与_run_ffmpeg一样终止整个进程组后再抛出异常。
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               start_new_session=True, preexec_fn=preexec_fn)
+    _LIVE_PROCESS_GROUPS.add(process.pid)
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except BaseException:
+        _kill_process_group(process.pid)
+        process.communicate()
+        raise
+    finally:
+        _LIVE_PROCESS_GROUPS.discard(process.pid)
+    return process.returncode, stdout, stderr.decode(errors='replace')
+
+
+def _sendfile_copy(src: str, dst: str) -> int:
+    """
+    用os.sendfile在内核中整文件复制（数据不经过用户态），返回复制的字节数
+    
+    不支持sendfile复制普通文件的平台回退到shutil.copyfile。
+    """
+    import shutil
+    
+    if not hasattr(os, "sendfile"):
+        shutil.copyfile(src, dst)
+        return os.path.getsize(dst)
+    
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(in_fd).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+    return offset
+
+
+def _prefetch_file(path: str):
+    """
+    提示内核对整个源文件做顺序预读（Linux posix_fadvise）
+    
+    流复制分段只顺序读取一次源文件，瓶颈在读吞吐；
+    在FFmpeg启动前发起预读，使磁盘读取与进程启动、探测重叠。其他平台上不做任何事。
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"预读提示失败 {path}: {e}")
+
+
+def _format_times_bulk(seconds: List[float]) -> List[str]:
+    """批量将秒数转换为FFmpeg时间格式 (HH:MM:SS.mmm)，一批片段的时间字符串一次生成"""
+    formatted = []
+    append = formatted.append
+    for value in seconds:
+        minutes, secs = divmod(value, 60)
+        hours, minutes = divmod(int(minutes), 60)
+        append(f"{hours:02d}:{minutes:02d}:{secs:06.3f}")
+    return formatted
+
+
+def _file_sizes(paths: List[str]) -> List[int]:
+    """每个文件只stat一次获取大小（同时完成存在性检查），不存在的文件大小记为0"""
+    sizes = []
+    for path in paths:
+        try:
+            sizes.append(os.stat(path).st_size)
+        except OSError:
+            sizes.append(0)
+    return sizes
+
+
+def _segment_columns(segments: List[Dict[str, Any]]) -> Tuple[List[float], List[float], List[int], List[str]]:
+    """
+    将片段字典列表一次性拆成按列存放的 (起始时间, 结束时间, 序号, 类型) 列表
+    
+    后续的批量时间格式化、排序和任务分发只读这几列，不再反复查字典。
+    """
+    starts = [segment['start_time'] for segment in segments]
+    ends = [segment['end_time'] for segment in segments]
+    indices = [segment.get('index', i + 1) for i, segment in enumerate(segments)]
+    types = [segment.get('type', f'片段{i+1}') for i, segment in enumerate(segments)]
+    return starts, ends, indices, types
+
+
+def _allowed_cpus() -> List[int]:
+    """当前进程允许使用的CPU编号（支持CPU亲和性的平台按亲和性集合计算）"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _env_int(name: str) -> int:
+    """读取整数环境变量，未设置或无效时返回0"""
+    try:
+        return max(0, int(os.environ.get(name, "0")))
+    except ValueError:
+        logger.warning(f"环境变量 {name} 不是有效整数，已忽略")
+        return 0
+
+
+@lru_cache(maxsize=1)
+def _available_encoders() -> frozenset:
+    """查询本机FFmpeg支持的编码器名称（进程内只查询一次），查询失败时为空"""
+    try:
+        result = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return frozenset()
+    # 编码器列表行格式: " V....D libx264  libx264 H.264 ..."
+    return frozenset(
+        parts[1] for parts in (line.split() for line in result.stdout.splitlines())
+        if len(parts) > 1 and len(parts[0]) == 6
+    )
+
+
+# 短切片的x264快速编码参数：无B帧、单参考帧、整段只有一个关键帧（不做场景切换检测），
+# 编码器搜索空间大幅缩小，速度约提升2-3倍；代价是同等码率下画质略降、切片内部不可快速跳转
+X264_FAST_ARGS = ("-tune", "zerolatency", "-bf", "0", "-refs", "1", "-g", "9999",
+                  "-sc_threshold", "0", "-pix_fmt", "yuv420p")
+
+# 只有短于该时长（秒）的切片使用X264_FAST_ARGS；更长的切片（如整段回退重编码）保持x264默认GOP和B帧
+X264_FAST_MAX_SECONDS = 30.0
+
+# 硬件H.264编码器及其编码参数，按优先级排列
+HW_ENCODER_ARGS = {
+    "h264_nvenc": ["-c:v", "h264_nvenc", "-preset", "p1", "-tune", "ll", "-rc", "vbr", "-cq", "28"],
+    "h264_videotoolbox": ["-c:v", "h264_videotoolbox", "-b:v", "4M", "-allow_sw", "1"],
+    "h264_qsv": ["-c:v", "h264_qsv", "-preset", "veryfast", "-global_quality", "28"],
+    "h264_vaapi": ["-vaapi_device", "/dev/dri/renderD128", "-vf", "format=nv12,hwupload",
+                   "-c:v", "h264_vaapi", "-qp", "28"],
+}
+
+
+# 单个FFmpeg进程中同时打开的硬件编码会话上限（消费级NVENC驱动限制并发会话数）
+HW_OUTPUTS_PER_RUN = 2
+
+
+def _detect_hw_encoder() -> Optional[str]:
+    """返回本机FFmpeg支持的第一个硬件H.264编码器，不存在时返回None"""
+    available = _available_encoders()
+    return next((name for name in HW_ENCODER_ARGS if name in available), None)
+
+
+@lru_cache(maxsize=4096)
+def _probe_video_info(video_path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """
+    ffprobe探测视频信息，按 (路径, 修改时间, 大小) 缓存
+    
+    探测失败时抛出异常，失败结果不会进入缓存。
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "format=duration:stream=width,height,codec_name",
+        "-of", "default=nw=1",
+        video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "ffprobe failed")
+    
+    # key=value 逐行输出，字段名互不重复，无需JSON解析
+    fields = dict(
+        line.split("=", 1) for line in result.stdout.splitlines()
+        if "=" in line and not line.endswith("=N/A")
+    )
+    width = fields.get("width")
+    height = fields.get("height")
+    return {
+        "duration": float(fields.get("duration") or 0),
+        "width": int(width) if width else None,
+        "height": int(height) if height else None,
+        "codec": fields.get("codec_name")
+    }
+
+
+@lru_cache(maxsize=4096)
+def _probe_keyframes(video_path: str, mtime_ns: int, size: int) -> Tuple[float, ...]:
+    """ffprobe枚举视频关键帧时间点，按 (路径, 修改时间, 大小) 缓存"""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-skip_frame", "nokey",
+        "-show_entries", "frame=best_effort_timestamp_time",
+        "-of", "csv=p=0",
+        video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "ffprobe failed")
+    
+    keyframes = []
+    for line in result.stdout.splitlines():
+        value = line.strip().rstrip(',')
+        if value and value != "N/A":
+            keyframes.append(float(value))
+    return tuple(sorted(keyframes))
+
 
 class ParallelVideoSlicer:
     """并行视频切片处理器"""
     
-    def __init__(self, max_workers: int = 4):
+    def __init__(self, max_workers: int = 0, stream_copy: bool = True,
+                 max_snap_seconds: float = 2.0, encoder: str = "libx264",
+                 encoder_preset: str = "ultrafast", crf: int = 28,
+                 threads_per_process: int = 0, pin_cpus: bool = False, hw_accel: bool = False,
+                 x264_tuning: Optional[List[str]] = None,
+                 x264_fast_max_seconds: float = X264_FAST_MAX_SECONDS):
         """
         初始化并行视频切片器
         
         Args:
-            max_workers: 最大并发FFmpeg进程数（默认4，根据CPU核心数调整）
+            max_workers: 最大并发FFmpeg进程数（默认0，按 可用CPU核心数 // 每进程线程数 自动计算，
+                         可用环境变量FFMPEG_WORKERS指定）
+            stream_copy: 优先使用单次FFmpeg流复制分段（不重新编码），失败时回退到并行重编码
+            max_snap_seconds: 流复制切点向后对齐关键帧的最大偏移（秒），超过时该切点改为重编码
+            encoder: 重编码使用的视频编码器（libx264 / libsvtav1；auto表示本机支持时使用libsvtav1）
+            encoder_preset: libx264编码预设（默认ultrafast）
+            crf: libx264质量参数（默认28）
+            threads_per_process: 每个重编码FFmpeg进程的线程数（默认0即2，可用环境变量FFMPEG_THREADS_PER指定）
+            pin_cpus: 将每个FFmpeg进程绑定到独立的一组CPU核心（仅支持CPU亲和性的平台）
+            hw_accel: 重编码优先使用硬件编码器（NVENC / VideoToolbox / QSV / VAAPI），
+                      本机不支持时使用encoder指定的软件编码器
+            x264_tuning: libx264短切片的附加编码参数（默认X264_FAST_ARGS，为短切片换取速度；
+                         传入空列表使用x264默认GOP和B帧配置，画质更好但更慢）
+            x264_fast_max_seconds: 短于该时长（秒）的切片才附加x264_tuning（默认30，0为全部不附加）
         """
+        self._created_dirs = set()
         self.temp_dir = Path("./temp")
-        self.temp_dir.mkdir(exist_ok=True)
+        self._ensure_dir(self.temp_dir)
         
         self.segments_output_dir = Path("./output_slices")
-        self.segments_output_dir.mkdir(exist_ok=True)
+        self._ensure_dir(self.segments_output_dir)
         
-        # 并行配置
-        self.max_workers = max_workers
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # 并行配置：按可用核心数自动确定并发进程数和每进程线程数
+        cpus = _allowed_cpus()
+        self.threads_per_process = threads_per_process or _env_int("FFMPEG_THREADS_PER") or 2
+        self.max_workers = (max_workers or _env_int("FFMPEG_WORKERS")
+                            or max(1, len(cpus) // self.threads_per_process))
         
-        logger.info(f"初始化并行视频切片器 - 最大并发FFmpeg进程: {max_workers}")
+        # CPU绑定：可用核心按每进程线程数划分为若干组，进程轮流使用
+        self._cpu_slots: List[List[int]] = []
+        if pin_cpus and hasattr(os, "sched_setaffinity"):
+            t = self.threads_per_process
+            self._cpu_slots = [cpus[i * t:(i + 1) * t] for i in range(len(cpus) // t)]
+        self._slot_counter = itertools.count()
+        self.stream_copy = stream_copy
+        self.max_snap_seconds = max_snap_seconds
+        self.encoder = self._select_encoder(encoder)
+        self._hwaccel_args: List[str] = []
+        hw_encoder = _detect_hw_encoder() if hw_accel else None
+        if hw_encoder:
+            self.encoder = hw_encoder
+            self._hwaccel_args = ["-hwaccel", "auto"]
+            # 硬件编码引擎数量有限，多进程并发编码会在引擎上排队
+            if not (max_workers or _env_int("FFMPEG_WORKERS")):
+                self.max_workers = min(self.max_workers, 4)
+            logger.info(f"使用硬件编码器: {hw_encoder}")
+        elif hw_accel:
+            logger.info(f"未检测到可用的硬件编码器，使用 {self.encoder}")
+        self._x264_tuning = list(X264_FAST_ARGS if x264_tuning is None else x264_tuning)
+        self._x264_fast_max_seconds = x264_fast_max_seconds
+        self._encoder_preset = encoder_preset
+        self._crf = crf
+        self._encoder_args = self._build_encoder_args(self.encoder, encoder_preset, crf)
+        self._fast_encoder_args = self._build_encoder_args(self.encoder, encoder_preset, crf, fast=True)
+        
+        logger.info(f"初始化并行视频切片器 - 最大并发FFmpeg进程: {self.max_workers}, "
+                    f"每进程线程数: {self.threads_per_process}")
+    
+    def _ensure_dir(self, path) -> None:
+        """创建目录；已确认存在的目录直接跳过，避免重复的mkdir系统调用"""
+        key = str(path)
+        if key not in self._created_dirs:
+            os.makedirs(key, exist_ok=True)
+            self._created_dirs.add(key)
+    
+    def _select_encoder(self, encoder: str) -> str:
+        """根据本机FFmpeg支持情况确定实际使用的编码器，不支持时回退到libx264"""
+        available = _available_encoders()
+        if encoder == "auto":
+            return "libsvtav1" if "libsvtav1" in available else "libx264"
+        if available and encoder not in available:
+            logger.warning(f"FFmpeg不支持编码器 {encoder}，改用libx264")
+            return "libx264"
+        return encoder
+    
+    def _build_encoder_args(self, encoder: str, preset: str, crf: int,
+                            threads: Optional[int] = None, fast: bool = False) -> List[str]:
+        """
+        构建重编码的视频编码参数（默认限制每进程线程数，并行主要在进程层面进行）
+        
+        fast为True时libx264附加短切片快速参数（x264_tuning）。
+        """
+        if encoder in HW_ENCODER_ARGS:
+            return list(HW_ENCODER_ARGS[encoder])
+        threads = str(threads or self.threads_per_process)
+        if encoder == "libsvtav1":
+            return ["-c:v", "libsvtav1", "-preset", "12", "-crf", "35",
+                    "-svtav1-params", "tune=0", "-threads", threads]
+        args = ["-c:v", encoder, "-preset", preset, "-crf", str(crf), "-threads", threads]
+        if encoder == "libx264" and fast:
+            args += self._x264_tuning
+        return args
+    
+    def _use_fast_tuning(self, duration: float) -> bool:
+        """切片时长短于x264_fast_max_seconds时使用短切片快速编码参数"""
+        return duration < self._x264_fast_max_seconds
+    
+    def _affinity_preexec(self) -> Optional[Callable[[], None]]:
+        """
+        返回把FFmpeg子进程绑定到下一组CPU核心的preexec_fn（未启用CPU绑定时返回None）
+        
+        绑定在子进程exec之前完成，FFmpeg创建的所有编码线程都会继承该亲和性。
+        """
+        if not self._cpu_slots:
+            return None
+        cpu_slot = self._cpu_slots[next(self._slot_counter) % len(self._cpu_slots)]
+        return partial(os.sched_setaffinity, 0, cpu_slot)
     
     def _format_time_for_ffmpeg(self, seconds: float) -> str:
         """将秒数转换为FFmpeg时间格式 (HH:MM:SS.mmm)"""
@@ -51,95 +442,187 @@ class ParallelVideoSlicer:
         secs = seconds % 60
         return f"{hours:02d}:{minutes:02d}:{secs:06.3f}"
     
+    def _segment_filename(self, video_id: str, segment_index: int, semantic_type: str) -> str:
+        """生成切片文件名"""
+        return SEGMENT_FILENAME_TEMPLATE.format(
+            video_id=video_id, index=segment_index, semantic_type=semantic_type.replace(' ', '_')
+        )
+    
+    def _segment_output_path(self, segment_index: int, semantic_type: str, video_id: str,
+                             output_dir: str = None) -> str:
+        """确定切片输出路径（指定输出目录时确保目录存在）"""
+        segment_filename = self._segment_filename(video_id, segment_index, semantic_type)
+        if output_dir:
+            self._ensure_dir(output_dir)
+            return os.path.join(output_dir, segment_filename)
+        return os.path.join(self.segments_output_dir, segment_filename)
+    
+    def _segment_command(self, video_path: str, start_time: float, end_time: float,
+                         output_path: str, reencode: bool,
+                         time_strs: Optional[Tuple[str, str]] = None) -> List[str]:
+        """构建单个片段的FFmpeg命令（time_strs为预先格式化的 (起始时间, 时长) 字符串）"""
+        # 格式化时间参数
+        if time_strs:
+            start_time_str, duration_str = time_strs
+        else:
+            start_time_str = self._format_time_for_ffmpeg(start_time)
+            duration_str = self._format_time_for_ffmpeg(end_time - start_time)
+        
+        if reencode:
+            # -i之前粗定位到切点前2秒的关键帧附近，-i之后只需解码最后不超过2秒，仍精确到帧
+            coarse_start = max(0.0, start_time - 2.0)
+            return [
+                "ffmpeg", "-y", *FFMPEG_QUIET_ARGS, *self._hwaccel_args,
+                "-ss", self._format_time_for_ffmpeg(coarse_start),
+                *_input_probe_args(video_path), "-i", str(video_path),
+                "-ss", self._format_time_for_ffmpeg(start_time - coarse_start),
+                "-t", duration_str,
+                *(self._fast_encoder_args if self._use_fast_tuning(end_time - start_time)
+                  else self._encoder_args),
+                "-c:a", "aac",
+                "-avoid_negative_ts", "make_zero",
+                "-fflags", "+genpts",
+                str(output_path)
+            ]
+        # 流复制：只拷贝数据包，不解码不编码
+        return [
+            "ffmpeg", "-y", *FFMPEG_QUIET_ARGS,
+            "-ss", start_time_str,
+            *_input_probe_args(video_path), "-i", str(video_path),
+            "-t", duration_str,
+            "-map", "0",
+            "-c", "copy",
+            "-avoid_negative_ts", "make_zero",
+            str(output_path)
+        ]
+    
+    def _segment_result(self, returncode: int, stderr: str, output_path: str, start_time: float,
+                        end_time: float, segment_index: int, processing_time: float) -> Dict[str, Any]:
+        """根据FFmpeg返回码和输出文件构建切片结果"""
+        segment_filename = os.path.basename(output_path)
+        
+        if returncode != 0:
+            logger.error(f"FFmpeg切分失败 {segment_filename}: {stderr}")
+            return {
+                "success": False,
+                "segment_index": segment_index,
+                "output_path": str(output_path),
+                "error": f"FFmpeg failed: {stderr}",
+                "processing_time": processing_time
+            }
+        
+        # 验证输出文件
+        try:
+            file_size = os.path.getsize(output_path)
+        except OSError:
+            file_size = 0
+        if file_size == 0:
+            return {
+                "success": False,
+                "segment_index": segment_index,
+                "output_path": str(output_path),
+                "error": "Output file is empty or missing",
+                "processing_time": processing_time
+            }
+        
+        logger.debug(f"成功切片 {segment_filename} ({file_size} bytes, {processing_time:.1f}s)")
+        
+        return {
+            "success": True,
+            "segment_index": segment_index,
+            "output_path": str(output_path),
+            "start_time": start_time,
+            "end_time": end_time,
+            "duration": end_time - start_time,
+            "file_size": file_size,
+            "processing_time": processing_time
+        }
+    
     def _extract_single_segment(self, video_path: str, start_time: float, end_time: float, 
                                segment_index: int, semantic_type: str, video_id: str, 
-                               output_dir: str = None) -> Dict[str, Any]:
+                               output_dir: str = None, reencode: bool = False) -> Dict[str, Any]:
         """
         提取单个视频片段（线程安全版本）
         
+        Args:
+            reencode: 是否重新编码。默认流复制（-ss置于-i之前快速定位，起点落在关键帧上），
+                      需要精确到帧的切点时设为True
+        
         Returns:
             包含结果信息的字典
         """
-        segment_filename = f"{video_id}_semantic_seg_{segment_index}_{semantic_type.replace(' ', '_')}.mp4"
-        
-        if output_dir:
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = Path(output_dir) / segment_filename
-        else:
-            output_path = self.segments_output_dir / segment_filename
-        
+        output_path = self._segment_output_path(segment_index, semantic_type, video_id, output_dir)
         start_process_time = time.time()
         
         try:
-            # 格式化时间参数
-            start_time_str = self._format_time_for_ffmpeg(start_time)
-            duration = end_time - start_time
-            duration_str = self._format_time_for_ffmpeg(duration)
-            
-            # 构建FFmpeg命令（优化版本）
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", str(video_path),
-                "-ss", start_time_str,
-                "-t", duration_str,
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-preset", "ultrafast",  # 更快的预设
-                "-crf", "28",           # 稍微降低质量以提升速度
-                "-threads", "1",        # 限制每个FFmpeg进程的线程数
-                "-avoid_negative_ts", "make_zero",
-                "-fflags", "+genpts",
-                str(output_path)
-            ]
+            cmd = self._segment_command(video_path, start_time, end_time, output_path, reencode)
             
             # 执行FFmpeg命令
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                check=False,
-                timeout=120  # 2分钟超时
-            )
-            
-            end_process_time = time.time()
-            processing_time = end_process_time - start_process_time
-            
-            if result.returncode != 0:
-                logger.error(f"FFmpeg切分失败 {segment_filename}: {result.stderr}")
-                return {
-                    "success": False,
-                    "segment_index": segment_index,
-                    "output_path": str(output_path),
-                    "error": f"FFmpeg failed: {result.stderr}",
-                    "processing_time": processing_time
-                }
-            
-            # 验证输出文件
-            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-                return {
-                    "success": False,
-                    "segment_index": segment_index,
-                    "output_path": str(output_path),
-                    "error": "Output file is empty or missing",
-                    "processing_time": processing_time
-                }
+            returncode, stderr = _run_ffmpeg(cmd, _segment_timeout(end_time - start_time),
+                                             self._affinity_preexec())
             
-            file_size = os.path.getsize(output_path)
-            logger.debug(f"成功切片 {segment_filename} ({file_size} bytes, {processing_time:.1f}s)")
+            return self._segment_result(returncode, stderr, output_path, start_time,
+                                        end_time, segment_index, time.time() - start_process_time)
             
+        except subprocess.TimeoutExpired:
+            logger.error(f"FFmpeg切片超时: {os.path.basename(output_path)}")
             return {
-                "success": True,
+                "success": False,
                 "segment_index": segment_index,
                 "output_path": str(output_path),
-                "start_time": start_time,
-                "end_time": end_time,
-                "duration": duration,
-                "file_size": file_size,
-                "processing_time": processing_time
+                "error": "FFmpeg timeout",
+                "processing_time": time.time() - start_process_time
+            }
+        except Exception as e:
+            logger.error(f"切片过程异常 {os.path.basename(output_path)}: {e}")
+            return {
+                "success": False,
+                "segment_index": segment_index,
+                "output_path": str(output_path),
+                "error": str(e),
+                "processing_time": time.time() - start_process_time
             }
+    
+    async def _extract_single_segment_async(self, video_path: str, start_time: float, end_time: float,
+                                            segment_index: int, output_path: str, reencode: bool = False,
+                                            time_strs: Optional[Tuple[str, str]] = None) -> Dict[str, Any]:
+        """
+        异步提取单个视频片段，等待FFmpeg期间不占用线程
+        
+        返回值与 _extract_single_segment 相同；输出路径和时间字符串 (起始时间, 时长) 由调用方
+        按批次预先生成，所在目录须已存在。
+        """
+        start_process_time = time.time()
+        
+        try:
+            cmd = self._segment_command(video_path, start_time, end_time, output_path, reencode,
+                                        time_strs)
             
-        except subprocess.TimeoutExpired:
-            logger.error(f"FFmpeg切片超时: {segment_filename}")
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+                preexec_fn=self._affinity_preexec()
+            )
+            _LIVE_PROCESS_GROUPS.add(process.pid)
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(),
+                                                   timeout=_segment_timeout(end_time - start_time))
+            except BaseException:
+                # 超时或任务被取消：终止整个进程组
+                _kill_process_group(process.pid)
+                await process.wait()
+                raise
+            finally:
+                _LIVE_PROCESS_GROUPS.discard(process.pid)
+            
+            return self._segment_result(process.returncode, stderr.decode(errors='replace'), output_path,
+                                        start_time, end_time, segment_index,
+                                        time.time() - start_process_time)
+            
+        except asyncio.TimeoutError:
+            logger.error(f"FFmpeg切片超时: {os.path.basename(output_path)}")
             return {
                 "success": False,
                 "segment_index": segment_index,
@@ -148,7 +631,7 @@ class ParallelVideoSlicer:
                 "processing_time": time.time() - start_process_time
             }
         except Exception as e:
-            logger.error(f"切片过程异常 {segment_filename}: {e}")
+            logger.error(f"切片过程异常 {os.path.basename(output_path)}: {e}")
             return {
                 "success": False,
                 "segment_index": segment_index,
@@ -159,9 +642,10 @@ class ParallelVideoSlicer:
     
     def extract_segments_parallel(self, video_path: str, segments: List[Dict[str, Any]], 
                                  video_id: str, output_dir: str = None,
-                                 progress_callback: Optional[callable] = None) -> List[Dict[str, Any]]:
+                                 progress_callback: Optional[callable] = None,
+                                 reencode: bool = False) -> List[Dict[str, Any]]:
         """
-        并行提取多个视频片段
+        并行提取多个视频片段（同步接口，在当前线程运行事件循环）
         
         Args:
             video_path: 原始视频文件路径
@@ -169,10 +653,24 @@ class ParallelVideoSlicer:
             video_id: 视频ID
             output_dir: 输出目录
             progress_callback: 进度回调函数
+            reencode: 是否重新编码（默认流复制）
             
         Returns:
             切片结果列表
         """
+        return asyncio.run(self.extract_segments_parallel_async(
+            video_path, segments, video_id, output_dir, progress_callback, reencode
+        ))
+    
+    async def extract_segments_parallel_async(self, video_path: str, segments: List[Dict[str, Any]],
+                                              video_id: str, output_dir: str = None,
+                                              progress_callback: Optional[callable] = None,
+                                              reencode: bool = False) -> List[Dict[str, Any]]:
+        """
+        并行提取多个视频片段：一个事件循环监管全部FFmpeg子进程，信号量限制并发数
+        
+        参数和返回值与 extract_segments_parallel 相同。
+        """
         if not segments:
             logger.warning("没有片段需要提取")
             return []
@@ -184,29 +682,41 @@ class ParallelVideoSlicer:
             progress_callback(0, f"开始并行切片 {total_segments} 个片段...")
         
         start_time = time.time()
+        semaphore = asyncio.Semaphore(self.max_workers)
         
-        # 提交所有切片任务
-        future_to_segment = {}
-        for i, segment in enumerate(segments):
-            future = self.executor.submit(
-                self._extract_single_segment,
-                video_path,
-                segment['start_time'],
-                segment['end_time'],
-                segment.get('index', i + 1),
-                segment.get('type', f'片段{i+1}'),
-                video_id,
-                output_dir
-            )
-            future_to_segment[future] = segment
+        # 片段按列展开，提交任务前一次性生成所有片段的时间字符串
+        starts, ends, indices, types = _segment_columns(segments)
+        time_strs = list(zip(
+            _format_times_bulk(starts),
+            _format_times_bulk([end - start for start, end in zip(starts, ends)])
+        ))
+        
+        # 输出目录只创建一次，所有输出路径在提交任务前生成
+        if output_dir:
+            self._ensure_dir(output_dir)
+        target_dir = str(output_dir or self.segments_output_dir)
+        output_paths = [os.path.join(target_dir, self._segment_filename(video_id, index, semantic_type))
+                        for index, semantic_type in zip(indices, types)]
+        
+        async def guarded(i: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._extract_single_segment_async(
+                    video_path,
+                    starts[i],
+                    ends[i],
+                    indices[i],
+                    output_paths[i],
+                    reencode,
+                    time_strs[i]
+                )
         
         # 收集结果
         results = []
         completed = 0
         
-        for future in as_completed(future_to_segment):
+        for future in asyncio.as_completed([guarded(i) for i in range(total_segments)]):
             try:
-                result = future.result()
+                result = await future
                 results.append(result)
                 completed += 1
                 
@@ -221,7 +731,7 @@ class ParallelVideoSlicer:
                 
                 # 日志输出
                 if result['success']:
-                    logger.info(f"✅ 切片完成 {completed}/{total_segments}: {Path(result['output_path']).name}")
+                    logger.info(f"✅ 切片完成 {completed}/{total_segments}: {os.path.basename(result['output_path'])}")
                 else:
                     logger.error(f"❌ 切片失败 {completed}/{total_segments}: {result.get('error', 'Unknown error')}")
                 
@@ -260,15 +770,454 @@ class ParallelVideoSlicer:
         
         return results
     
+    def get_video_info(self, video_path: str) -> Optional[Dict[str, Any]]:
+        """
+        获取视频基本信息（时长、分辨率、编码），同一文件只探测一次
+        
+        Args:
+            video_path: 视频文件路径
+            
+        Returns:
+            视频信息字典，探测失败时返回None
+        """
+        try:
+            stat = os.stat(video_path)
+            return _probe_video_info(os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size)
+        except Exception as e:
+            logger.error(f"无法获取视频信息 {video_path}: {e}")
+            return None
+    
+    def get_video_duration(self, video_path: str) -> Optional[float]:
+        """获取视频时长（秒），失败时返回None"""
+        info = self.get_video_info(video_path)
+        return info["duration"] if info else None
+    
+    def prefetch_keyframes(self, video_path: str) -> None:
+        """
+        预先探测流复制分段所需的关键帧（结果进入缓存）
+        
+        可在等待镜头分析期间调用，分析完成后切片无需再等待ffprobe。
+        """
+        if self.stream_copy:
+            self._keyframe_times(video_path)
+    
+    def _keyframe_times(self, video_path: str) -> Tuple[float, ...]:
+        """
+        获取视频关键帧时间点（秒），同一文件只探测一次
+        
+        Args:
+            video_path: 视频文件路径
+            
+        Returns:
+            升序关键帧时间，探测失败时为空
+        """
+        try:
+            stat = os.stat(video_path)
+            return _probe_keyframes(os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size)
+        except Exception as e:
+            logger.warning(f"关键帧探测失败 {video_path}: {e}")
+            return ()
+    
+    def _snap_to_keyframe(self, keyframes: Tuple[float, ...], boundary: float) -> Optional[float]:
+        """返回不早于切点的第一个关键帧时间，不存在时返回None"""
+        index = bisect.bisect_left(keyframes, boundary - 0.001)
+        return keyframes[index] if index < len(keyframes) else None
+    
+    def _run_with_progress(self, cmd: List[str], boundaries: List[float], timeout: float = 600,
+                           progress_callback: Optional[callable] = None) -> Optional[Tuple[int, str]]:
+        """
+        执行带 -progress pipe:1 的FFmpeg命令，输出时间越过切点时回调分段完成事件
+        
+        Args:
+            cmd: FFmpeg命令（需包含 -progress pipe:1）
+            boundaries: 升序切点时间（秒）
+            timeout: 超时时间（秒），超时后终止进程
+            progress_callback: 进度回调函数
+            
+        Returns:
+            (返回码, stderr文本)，超时返回None
+        """
+        total_pieces = len(boundaries) + 1
+        closed = 0
+        timed_out = threading.Event()
+        
+        with tempfile.TemporaryFile(mode='w+', encoding='utf-8', errors='replace') as stderr_file:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                                       text=True, bufsize=1, start_new_session=True,
+                                       preexec_fn=self._affinity_preexec())
+            _LIVE_PROCESS_GROUPS.add(process.pid)
+            
+            def kill_on_timeout():
+                timed_out.set()
+                _kill_process_group(process.pid)
+            
+            timer = threading.Timer(timeout, kill_on_timeout)
+            timer.start()
+            try:
+                for line in process.stdout:
+                    # out_time_us / out_time_ms 的单位均为微秒
+                    key, _, value = line.strip().partition('=')
+                    if key not in ("out_time_us", "out_time_ms") or not value.isdigit():
+                        continue
+                    out_time = int(value) / 1_000_000
+                    while closed < len(boundaries) and out_time >= boundaries[closed]:
+                        closed += 1
+                        if progress_callback:
+                            progress_callback(
+                                int(closed / total_pieces * 100),
+                                f"流复制分段 {closed}/{total_pieces} 已完成"
+                            )
+                process.wait()
+            finally:
+                timer.cancel()
+                if process.poll() is None:
+                    _kill_process_group(process.pid)
+                    process.wait()
+                _LIVE_PROCESS_GROUPS.discard(process.pid)
+            
+            if timed_out.is_set():
+                return None
+            
+            stderr_file.seek(0)
+            return process.returncode, stderr_file.read()
+    
+    def extract_segments_stream_copy(self, video_path: str, segments: List[Dict[str, Any]],
+                                     video_id: str, output_dir: str,
+                                     progress_callback: Optional[callable] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        单次FFmpeg调用按切点流复制分段（只读取一次源文件，不重新编码）
+        
+        流复制只能在关键帧处切分：每个切点向后对齐到最近的关键帧，
+        对齐偏移超过max_snap_seconds的切点不参与流复制，其两侧片段单独重编码。
+        片段不连续、FFmpeg失败或输出数量不符时返回None，由调用方整体回退到并行重编码。
+        
+        Args:
+            video_path: 原始视频文件路径
+            segments: 按时间排序的片段信息列表
+            video_id: 视频ID
+            output_dir: 输出目录
+            progress_callback: 进度回调函数（每个分段写完时触发）
+            
+        Returns:
+            切片结果列表，无法使用流复制时返回None
+        """
+        if not segments:
+            return []
+        
+        # 流复制分段要求片段从0开始且首尾相接
+        if segments[0]['start_time'] > 0.05:
+            return None
+        for prev, cur in zip(segments, segments[1:]):
+            if abs(cur['start_time'] - prev['end_time']) > 0.05:
+                return None
+        
+        # 切点对齐到关键帧；无关键帧信息时按原切点交给FFmpeg
+        keyframes = self._keyframe_times(video_path)
+        cut_points = []  # (片段序号, 实际切点)
+        for i, segment in enumerate(segments[1:], start=1):
+            boundary = segment['start_time']
+            if not keyframes:
+                cut_points.append((i, boundary))
+                continue
+            snapped = self._snap_to_keyframe(keyframes, boundary)
+            if (snapped is not None and snapped - boundary <= self.max_snap_seconds
+                    and (not cut_points or snapped > cut_points[-1][1])):
+                cut_points.append((i, snapped))
+            else:
+                logger.debug(f"切点 {boundary:.3f}s 无邻近关键帧，改为重编码")
+        
+        self._ensure_dir(output_dir)
+        output_pattern = Path(output_dir) / f"{video_id}_stream_seg_%03d.mp4"
+        
+        cmd = [
+            "ffmpeg", "-y", *FFMPEG_QUIET_ARGS,
+            "-progress", "pipe:1",
+            *_input_probe_args(video_path), "-i", str(video_path),
+            "-map", "0",
+            "-c", "copy",
+            "-f", "segment",
+            "-reset_timestamps", "1",
+            "-avoid_negative_ts", "make_zero",
+        ]
+        if cut_points:
+            cmd += ["-segment_times", ",".join(f"{t:.3f}" for _, t in cut_points)]
+        cmd.append(str(output_pattern))
+        
+        _prefetch_file(video_path)
+        start_process_time = time.time()
+        
+        result = self._run_with_progress(cmd, [t for _, t in cut_points],
+                                         progress_callback=progress_callback)
+        if result is None:
+            logger.warning(f"流复制分段超时，回退到重编码: {video_id}")
+        
+        produced = [os.path.join(output_dir, STREAM_SEGMENT_TEMPLATE.format(video_id=video_id, index=i))
+                    for i in range(len(cut_points) + 1)]
+        
+        sizes = _file_sizes(produced) if result is not None and result[0] == 0 else []
+        if result is None or result[0] != 0 or not all(sizes):
+            if result is not None and result[0] != 0:
+                logger.warning(f"流复制分段失败，回退到重编码: {result[1][-500:]}")
+            elif result is not None:
+                logger.warning(f"流复制分段输出数量不符，回退到重编码: {video_id}")
+            for stale in Path(output_dir).glob(f"{video_id}_stream_seg_*.mp4"):
+                stale.unlink(missing_ok=True)
+            return None
+        
+        processing_time = time.time() - start_process_time
+        per_piece_time = processing_time / len(produced)
+        
+        # 每个输出文件覆盖 [起始片段, 结束片段) 区间
+        piece_bounds = [0] + [i for i, _ in cut_points] + [len(segments)]
+        piece_times = [0.0] + [t for _, t in cut_points] + [segments[-1]['end_time']]
+        
+        results = []
+        reencode = []
+        for piece, produced_path in enumerate(produced):
+            first, last = piece_bounds[piece], piece_bounds[piece + 1]
+            
+            if last - first > 1:
+                # 区间内含未对齐的切点，丢弃流复制结果，逐个片段重编码
+                os.remove(produced_path)
+                reencode.extend(range(first, last))
+                continue
+            
+            segment = segments[first]
+            segment_index = segment.get('index', first + 1)
+            output_path = os.path.join(output_dir, self._segment_filename(
+                video_id, segment_index, segment.get('type', f'片段{first+1}')
+            ))
+            os.replace(produced_path, output_path)
+            
+            start_time, end_time = piece_times[piece], piece_times[piece + 1]
+            results.append({
+                "success": True,
+                "segment_index": segment_index,
+                "output_path": output_path,
+                "start_time": start_time,
+                "end_time": end_time,
+                "duration": end_time - start_time,
+                "file_size": sizes[piece],
+                "processing_time": per_piece_time
+            })
+        
+        if reencode:
+            logger.info(f"🔁 {len(reencode)} 个片段切点未对齐关键帧，单独重编码")
+            results.extend(self.extract_segments_parallel(
+                video_path=video_path,
+                segments=[dict(segments[i], index=segments[i].get('index', i + 1)) for i in reencode],
+                video_id=video_id,
+                output_dir=output_dir,
+                reencode=True
+            ))
+        
+        logger.info(f"⚡ 流复制分段完成: {len(produced)} 个文件, 耗时 {processing_time:.1f}秒")
+        return results
+    
+    def extract_segments_copy_only(self, video_path: str, segments: List[Dict[str, Any]],
+                                   video_id: str, output_dir: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        不启动FFmpeg的字节复制快速路径：片段覆盖整个MP4源文件时直接复制文件
+        
+        只处理单个片段从0开始、到视频结尾结束且源文件本身为MP4的情况（输出与源文件字节相同），
+        复制走os.sendfile，不经过编解码和封装。其他情况返回None，由调用方使用FFmpeg切片。
+        
+        Args:
+            video_path: 原始视频文件路径
+            segments: 片段信息列表
+            video_id: 视频ID
+            output_dir: 输出目录
+            
+        Returns:
+            切片结果列表，不适用时返回None
+        """
+        if len(segments) != 1 or Path(video_path).suffix.lower() != ".mp4":
+            return None
+        
+        segment = segments[0]
+        duration = self.get_video_duration(video_path)
+        if (not duration or segment['start_time'] > 0.05
+                or abs(segment['end_time'] - duration) > 0.05):
+            return None
+        
+        self._ensure_dir(output_dir)
+        segment_index = segment.get('index', 1)
+        output_path = os.path.join(output_dir, self._segment_filename(
+            video_id, segment_index, segment.get('type', '片段1')
+        ))
+        
+        start_process_time = time.time()
+        try:
+            file_size = _sendfile_copy(str(video_path), output_path)
+        except OSError as e:
+            logger.warning(f"整文件复制失败，改用FFmpeg切片: {e}")
+            Path(output_path).unlink(missing_ok=True)
+            return None
+        processing_time = time.time() - start_process_time
+        
+        logger.info(f"⚡ 片段覆盖整个视频，直接复制文件: {os.path.basename(output_path)}")
+        return [{
+            "success": True,
+            "segment_index": segment_index,
+            "output_path": output_path,
+            "start_time": segment['start_time'],
+            "end_time": segment['end_time'],
+            "duration": segment['end_time'] - segment['start_time'],
+            "file_size": file_size,
+            "processing_time": processing_time
+        }]
+    
+    def _batched_commands(self, video_path: str, starts: List[float], ends: List[float],
+                          indices: List[int], types: List[str], video_id: str, output_dir: str,
+                          reencode: bool) -> Tuple[List[Tuple[int, str]], List[Tuple[List[str], float]]]:
+        """
+        为批量切片生成FFmpeg命令
+        
+        片段按起点排序后分成若干次运行。重编码时每次运行在-i之前粗定位到本次首个片段起点前2秒，
+        各输出的 -ss/-to 以该位置为基准，只解码本次运行覆盖的区间，超时按解码区间的长度计算；
+        流复制只读取数据包，从头读取源文件，超时固定为600秒；起点须已对齐到关键帧，
+        -ss 向前取整到毫秒，避免四舍五入后越过关键帧。
+        
+        Returns:
+            (计划输出列表 [(片段在列中的位置, 输出路径)], 命令列表 [(FFmpeg命令, 超时秒数)])
+        """
+        if reencode:
+            codec_args, fast_codec_args = (
+                [*self._build_encoder_args(self.encoder, self._encoder_preset, self._crf,
+                                           threads=self.threads_per_process, fast=fast),
+                 "-c:a", "aac"]
+                for fast in (False, True)
+            )
+            outputs_per_run = (min(self.max_workers, HW_OUTPUTS_PER_RUN)
+                               if self.encoder in HW_ENCODER_ARGS else self.max_workers)
+        else:
+            codec_args = fast_codec_args = ["-map", "0", "-c", "copy"]
+            outputs_per_run = len(starts)
+        
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        planned = []
+        commands = []
+        for offset in range(0, len(order), outputs_per_run):
+            run = order[offset:offset + outputs_per_run]
+            cmd = ["ffmpeg", "-y", *FFMPEG_QUIET_ARGS]
+            seek_base = 0.0
+            if reencode:
+                seek_base = max(0.0, starts[run[0]] - 2.0)
+                cmd += [*self._hwaccel_args, "-ss", self._format_time_for_ffmpeg(seek_base)]
+            cmd += [*_input_probe_args(video_path), "-i", str(video_path)]
+            lead = 0.0 if reencode else 0.0005
+            start_strs = _format_times_bulk([starts[i] - seek_base - lead for i in run])
+            end_strs = _format_times_bulk([ends[i] - seek_base for i in run])
+            for i, start_str, end_str in zip(run, start_strs, end_strs):
+                output_path = os.path.join(output_dir, self._segment_filename(video_id, indices[i], types[i]))
+                cmd += [
+                    "-ss", start_str,
+                    "-to", end_str,
+                    *(fast_codec_args if self._use_fast_tuning(ends[i] - starts[i]) else codec_args),
+                    "-avoid_negative_ts", "make_zero",
+                    output_path
+                ]
+                planned.append((i, output_path))
+            # 流复制受读写带宽限制；重编码要解码从粗定位点到本次最后一个片段结尾的整段
+            timeout = _segment_timeout(max(ends[i] for i in run) - seek_base) if reencode else 600
+            commands.append((cmd, timeout))
+        return planned, commands
+    
+    def extract_segments_batched(self, video_path: str, segments: List[Dict[str, Any]],
+                                 video_id: str, output_dir: str,
+                                 reencode: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """
+        单次FFmpeg调用提取任意片段（片段可以不连续或重叠）
+        
+        一个输入对应多个输出，每个输出带各自的 -ss/-to（命令构建见_batched_commands）。
+        流复制时全部片段由一个进程输出，起点向后对齐到关键帧（偏移不超过max_snap_seconds，
+        结果中的start_time为对齐后的时间），无法对齐时返回None；重编码时每个输出有自己的编码器，
+        因此每个进程最多输出max_workers个片段（硬件编码最多HW_OUTPUTS_PER_RUN个，受驱动会话数限制），
+        每个编码器使用threads_per_process个线程，线程数和帧缓冲不随片段数增长。
+        FFmpeg失败或任一输出缺失时返回None，由调用方回退。
+        
+        Args:
+            video_path: 原始视频文件路径
+            segments: 片段信息列表
+            video_id: 视频ID
+            output_dir: 输出目录
+            reencode: 是否重新编码（默认流复制）
+            
+        Returns:
+            切片结果列表，失败时返回None
+        """
+        if not segments:
+            return []
+        
+        self._ensure_dir(output_dir)
+        
+        mode = "批量重编码" if reencode else "批量流复制"
+        starts, ends, indices, types = _segment_columns(segments)
+        if not reencode:
+            # -c copy只能从关键帧开始输出可解码的画面
+            keyframes = self._keyframe_times(video_path)
+            snapped = [self._snap_to_keyframe(keyframes, start) for start in starts]
+            if not keyframes or any(
+                    t is None or t - start > self.max_snap_seconds or t >= end
+                    for t, start, end in zip(snapped, starts, ends)):
+                logger.info(f"片段起点无法对齐关键帧，跳过{mode}: {video_id}")
+                return None
+            starts = snapped
+        planned, commands = self._batched_commands(video_path, starts, ends, indices, types,
+                                                   video_id, output_dir, reencode)
+        
+        _prefetch_file(video_path)
+        start_process_time = time.time()
+        
+        failed = False
+        for cmd, timeout in commands:
+            try:
+                returncode, stderr = _run_ffmpeg(cmd, timeout, self._affinity_preexec())
+                failed = returncode != 0
+                if failed:
+                    logger.warning(f"{mode}失败，回退到逐片段切片: {stderr[-500:]}")
+            except subprocess.TimeoutExpired:
+                logger.warning(f"{mode}超时，回退到逐片段切片: {video_id}")
+                failed = True
+            if failed:
+                break
+        
+        sizes = [] if failed else _file_sizes([path for _, path in planned])
+        if failed or not all(sizes):
+            if not failed:
+                logger.warning(f"{mode}输出缺失，回退到逐片段切片: {video_id}")
+            for _, path in planned:
+                Path(path).unlink(missing_ok=True)
+            return None
+        
+        processing_time = time.time() - start_process_time
+        per_piece_time = processing_time / len(planned)
+        
+        results = []
+        for (i, output_path), file_size in zip(planned, sizes):
+            results.append({
+                "success": True,
+                "segment_index": indices[i],
+                "output_path": output_path,
+                "start_time": starts[i],
+                "end_time": ends[i],
+                "duration": ends[i] - starts[i],
+                "file_size": file_size,
+                "processing_time": per_piece_time
+            })
+        
+        logger.info(f"⚡ {mode}完成: {len(results)} 个片段, 耗时 {processing_time:.1f}秒")
+        return results
+    
     def extract_segment(self, video_path: str, start_time: float, end_time: float, 
                        segment_index: int, semantic_type: str, video_id: str, 
-                       output_dir: str = None) -> Optional[str]:
+                       output_dir: str = None, reencode: bool = False) -> Optional[str]:
         """
         兼容原VideoSlicer的单片段提取接口
         """
         result = self._extract_single_segment(
             video_path, start_time, end_time, segment_index, 
-            semantic_type, video_id, output_dir
+            semantic_type, video_id, output_dir, reencode
         )
         
         if result['success']:
@@ -277,9 +1226,60 @@ class ParallelVideoSlicer:
             logger.error(f"片段提取失败: {result.get('error', 'Unknown error')}")
             return None
     
+    def _memory_segment_command(self, video_path: str, start_time: float, end_time: float,
+                                reencode: bool) -> List[str]:
+        """
+        构建把单个片段以分片MP4写到stdout的FFmpeg命令
+        
+        分片MP4管道封装只接受音视频流：只映射第一路视频和音频（如有），
+        源文件中的数据流/字幕流（如tmcd、mov_text）不会进入输出。
+        """
+        cmd = self._segment_command(video_path, start_time, end_time, "pipe:1", reencode)
+        if "-map" in cmd:
+            at = cmd.index("-map")
+            del cmd[at:at + 2]
+        cmd[-1:] = ["-map", "0:v:0", "-map", "0:a?",
+                    "-movflags", "+frag_keyframe+empty_moov", "-f", "mp4", "pipe:1"]
+        return cmd
+    
+    def extract_segments_to_memory(self, video_path: str, segments: List[Dict[str, Any]],
+                                   reencode: bool = False) -> Iterator[bytes]:
+        """
+        逐个切片并直接返回MP4字节，不在磁盘上生成中间文件
+        
+        供进程内的下游步骤（模型推理、缩略图等）使用：FFmpeg以分片MP4
+        (`frag_keyframe+empty_moov`) 写到stdout，父进程从管道读取，省去写盘再读回。
+        需要落盘文件的调用方仍使用create_slices_from_shots。
+        
+        Args:
+            video_path: 原始视频文件路径
+            segments: 片段信息列表
+            reencode: 是否重编码（默认流复制）
+            
+        Returns:
+            按segments顺序产出每个切片的MP4字节，失败的片段产出空bytes
+        """
+        starts, ends, indices, _ = _segment_columns(segments)
+        for start_time, end_time, segment_index in zip(starts, ends, indices):
+            cmd = self._memory_segment_command(video_path, start_time, end_time, reencode)
+            try:
+                returncode, data, stderr = _run_ffmpeg_to_memory(
+                    cmd, _segment_timeout(end_time - start_time), self._affinity_preexec()
+                )
+            except subprocess.TimeoutExpired:
+                logger.error(f"片段 {segment_index} 内存切片超时")
+                yield b""
+                continue
+            if returncode != 0:
+                logger.error(f"片段 {segment_index} 内存切片失败: {stderr.strip()}")
+                yield b""
+                continue
+            yield data
+    
     def create_slices_from_shots(self, video_path: str, shots: List[Dict[str, Any]], 
                                 video_name: str, output_dir: str = None,
-                                progress_callback: Optional[callable] = None) -> List[Dict[str, Any]]:
+                                progress_callback: Optional[callable] = None,
+                                reencode: bool = False) -> List[Dict[str, Any]]:
         """
         从镜头信息创建视频切片（并行版本）
         
@@ -289,6 +1289,8 @@ class ParallelVideoSlicer:
             video_name: 视频名称
             output_dir: 输出目录
             progress_callback: 进度回调
+            reencode: 全部重新编码以获得精确到帧的切点（默认优先流复制，
+                      流复制失败的片段再单独重编码）
             
         Returns:
             切片结果列表
@@ -303,18 +1305,72 @@ class ParallelVideoSlicer:
         else:
             final_output_dir = self.segments_output_dir / video_name
         
-        final_output_dir.mkdir(parents=True, exist_ok=True)
+        self._ensure_dir(final_output_dir)
         
         logger.info(f"基于 {len(shots)} 个镜头创建视频切片")
         
-        # 执行并行切片
-        results = self.extract_segments_parallel(
-            video_path=video_path,
-            segments=shots,
-            video_id=video_name,
-            output_dir=str(final_output_dir),
-            progress_callback=progress_callback
-        )
+        # 优先单次流复制分段，不可用时执行并行重编码切片
+        results = None
+        if self.stream_copy and not reencode:
+            # 单个片段覆盖整个视频时无需FFmpeg，直接复制文件
+            results = self.extract_segments_copy_only(
+                video_path=video_path,
+                segments=shots,
+                video_id=video_name,
+                output_dir=str(final_output_dir)
+            )
+            if results is None:
+                results = self.extract_segments_stream_copy(
+                    video_path=video_path,
+                    segments=shots,
+                    video_id=video_name,
+                    output_dir=str(final_output_dir),
+                    progress_callback=progress_callback
+                )
+            if results is None:
+                # 片段不连续等无法分段的情况：单次FFmpeg多输出流复制
+                results = self.extract_segments_batched(
+                    video_path=video_path,
+                    segments=shots,
+                    video_id=video_name,
+                    output_dir=str(final_output_dir)
+                )
+            if results is not None and progress_callback:
+                progress_callback(100, f"流复制分段完成 {len(results)}/{len(shots)}")
+        
+        if results is None and reencode:
+            # 全部重编码：一个FFmpeg进程解码一遍源视频输出所有片段，省去每个片段的进程启动和重复解码
+            results = self.extract_segments_batched(
+                video_path=video_path,
+                segments=shots,
+                video_id=video_name,
+                output_dir=str(final_output_dir),
+                reencode=True
+            )
+        
+        if results is None:
+            results = self.extract_segments_parallel(
+                video_path=video_path,
+                segments=shots,
+                video_id=video_name,
+                output_dir=str(final_output_dir),
+                progress_callback=progress_callback,
+                reencode=reencode
+            )
+            
+            # 逐片段流复制失败的片段改为重编码
+            failed_indices = {r['segment_index'] for r in results if not r['success']}
+            if failed_indices and not reencode:
+                retry = [dict(shot, index=shot.get('index', i + 1)) for i, shot in enumerate(shots)
+                         if shot.get('index', i + 1) in failed_indices]
+                logger.info(f"🔁 {len(retry)} 个片段流复制失败，改为重编码")
+                results = [r for r in results if r['success']] + self.extract_segments_parallel(
+                    video_path=video_path,
+                    segments=retry,
+                    video_id=video_name,
+                    output_dir=str(final_output_dir),
+                    reencode=True
+                )
         
         # 转换为兼容格式
         slices = []
@@ -331,8 +1387,3 @@ class ParallelVideoSlicer:
                 })
         
         return slices
-    
-    def __del__(self):
-        """清理资源"""
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=True) 
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 与run.py一致：src目录下的模块按顶层模块导入
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
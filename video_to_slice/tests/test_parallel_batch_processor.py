@@ -0,0 +1,24 @@
+from parallel_batch_processor import _merge_short_shots
+
+
+def _shot(start, end):
+    return {'start_time': start, 'end_time': end, 'duration': end - start}
+
+
+def test_merge_short_shots_disabled_keeps_shots():
+    shots = [_shot(0, 0.5), _shot(0.5, 3)]
+    assert _merge_short_shots(shots, 0) is shots
+
+
+def test_merge_short_shots_joins_previous_and_keeps_contiguity():
+    shots = [_shot(0, 2), _shot(2, 2.4), _shot(2.4, 5), _shot(5, 5.3)]
+    merged = _merge_short_shots(shots, 1.0)
+    assert [(s['start_time'], s['end_time']) for s in merged] == [(0, 2.4), (2.4, 5.3)]
+    assert [s['duration'] for s in merged] == [2.4, 5.3 - 2.4]
+
+
+def test_merge_short_shots_first_shot_joins_next():
+    shots = [_shot(0, 0.3), _shot(0.3, 4), _shot(4, 8)]
+    merged = _merge_short_shots(shots, 1.0)
+    assert [(s['start_time'], s['end_time']) for s in merged] == [(0, 4), (4, 8)]
+    assert merged[0]['duration'] == 4
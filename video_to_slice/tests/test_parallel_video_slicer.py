@@ -0,0 +1,82 @@
+import pytest
+
+from parallel_video_slicer import ParallelVideoSlicer
+
+
+@pytest.fixture
+def slicer(tmp_path, monkeypatch):
+    # 构造函数会在当前目录创建temp/output_slices
+    monkeypatch.chdir(tmp_path)
+    return ParallelVideoSlicer(max_workers=2, threads_per_process=2, encoder="libx264")
+
+
+def _option_values(cmd, option):
+    return [cmd[i + 1] for i, arg in enumerate(cmd) if arg == option]
+
+
+def test_batched_reencode_runs_seek_before_input(slicer, tmp_path):
+    starts = [100.0, 10.0, 50.0]
+    ends = [110.0, 20.0, 55.0]
+    planned, commands = slicer._batched_commands(
+        "in.mp4", starts, ends, [1, 2, 3], ["a", "b", "c"], "vid", str(tmp_path), reencode=True
+    )
+
+    # 按起点排序，每次运行最多max_workers个输出
+    assert [i for i, _ in planned] == [1, 2, 0]
+    assert len(commands) == 2
+
+    first, first_timeout = commands[0]
+    input_at = first.index("-i")
+    assert first[input_at + 1] == "in.mp4"
+    # -i之前的-ss是本次首个片段起点前2秒，各输出的-ss/-to以此为基准
+    assert first[:input_at].count("-ss") == 1
+    assert first[first[:input_at].index("-ss") + 1] == "00:00:08.000"
+    assert _option_values(first[input_at:], "-ss") == ["00:00:02.000", "00:00:42.000"]
+    assert _option_values(first[input_at:], "-to") == ["00:00:12.000", "00:00:47.000"]
+    # 超时按解码区间 (8s → 55s) 计算
+    assert first_timeout == pytest.approx(5 * 47.0)
+
+    second, second_timeout = commands[1]
+    input_at = second.index("-i")
+    assert second[second[:input_at].index("-ss") + 1] == "00:01:38.000"
+    assert _option_values(second[input_at:], "-ss") == ["00:00:02.000"]
+    assert _option_values(second[input_at:], "-to") == ["00:00:12.000"]
+    assert second_timeout == pytest.approx(60.0)
+
+    for cmd, _ in commands:
+        assert _option_values(cmd, "-threads") == ["2"] * len(_option_values(cmd, "-to"))
+
+
+def test_batched_copy_single_run_reads_from_start(slicer, tmp_path):
+    planned, commands = slicer._batched_commands(
+        "in.mp4", [4.0045, 1.0], [6.0, 3.0], [1, 2], ["a", "b"], "vid", str(tmp_path), reencode=False
+    )
+
+    assert [i for i, _ in planned] == [1, 0]
+    assert len(commands) == 1
+    cmd, timeout = commands[0]
+    input_at = cmd.index("-i")
+    assert "-ss" not in cmd[:input_at]
+    # 关键帧起点向前取整到毫秒，不会越过关键帧
+    assert _option_values(cmd, "-ss") == ["00:00:01.000", "00:00:04.004"]
+    assert _option_values(cmd, "-to") == ["00:00:03.000", "00:00:06.000"]
+    assert timeout == 600
+
+
+def test_fast_x264_tuning_only_for_short_slices(slicer, tmp_path):
+    _, commands = slicer._batched_commands(
+        "in.mp4", [0.0, 100.0], [5.0, 400.0], [1, 2], ["a", "b"], "vid", str(tmp_path), reencode=True
+    )
+    cmd = commands[0][0]
+    outputs = [i for i, arg in enumerate(cmd) if arg.endswith(".mp4") and cmd[i - 1] != "-i"]
+    short_args, long_args = cmd[:outputs[0]], cmd[outputs[0]:outputs[1]]
+    assert "zerolatency" in short_args
+    assert "zerolatency" not in long_args
+
+
+@pytest.mark.parametrize("reencode", [False, True])
+def test_memory_segment_command_maps_only_audio_video(slicer, reencode):
+    cmd = slicer._memory_segment_command("in.mp4", 5.0, 8.0, reencode)
+
+    assert _option_values(cmd, "-map") == ["0:v:0", "0:a?"]
+    assert cmd[-5:] == ["-movflags", "+frag_keyframe+empty_moov", "-f", "mp4", "pipe:1"]
@@ -25,6 +25,7 @@
 import os
 import sys
 import argparse
+import asyncio
 import logging
 import tempfile
 from pathlib import Path
@@ -334,53 +335,103 @@ class BatchVideoTranscriber:
                     preset_vocabulary_id=preset_vocabulary_id
                 )
                 
-                if not trans_result.get("success"):
-                    return {
-                        "success": False,
-                        "error": f"转录失败: {trans_result.get('error', '未知错误')}",
-                        "error_type": "transcription_failed"
-                    }
-                
-                # 3. 🔒 严格的质量保证 - 必须有精确时间戳片段
-                segments = trans_result.get('segments', [])
-                if not segments or len(segments) == 0:
-                    return {
-                        "success": False,
-                        "quality_rejected": True,
-                        "error": "转录质量不合格: 缺少时间戳片段",
-                        "error_type": "no_timestamps"
-                    }
+                return self._save_srt_from_transcription(video_path, output_srt_path, trans_result)
                 
-                # 4. 🔍 验证时间戳片段质量
-                quality_check = self._validate_segments_quality(segments, Path(video_path).name)
-                if not quality_check["passed"]:
+        except Exception as e:
+            logger.error(f"转录视频失败 {video_path}: {e}")
+            return {
+                "success": False,
+                "error": f"处理异常: {str(e)}",
+                "error_type": "processing_exception"
+            }
+    
+    def _save_srt_from_transcription(self, video_path: str, output_srt_path: str,
+                                     trans_result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        校验转录结果质量并保存SRT文件
+        
+        Args:
+            video_path: 视频文件路径
+            output_srt_path: 输出SRT文件路径
+            trans_result: 音频转录结果
+            
+        Returns:
+            Dict: 详细的转录结果，包含质量统计信息
+        """
+        if not trans_result.get("success"):
+            return {
+                "success": False,
+                "error": f"转录失败: {trans_result.get('error', '未知错误')}",
+                "error_type": "transcription_failed"
+            }
+        
+        # 3. 🔒 严格的质量保证 - 必须有精确时间戳片段
+        segments = trans_result.get('segments', [])
+        if not segments or len(segments) == 0:
+            return {
+                "success": False,
+                "quality_rejected": True,
+                "error": "转录质量不合格: 缺少时间戳片段",
+                "error_type": "no_timestamps"
+            }
+        
+        # 4. 🔍 验证时间戳片段质量
+        quality_check = self._validate_segments_quality(segments, Path(video_path).name)
+        if not quality_check["passed"]:
+            return {
+                "success": False,
+                "quality_rejected": True,
+                "error": f"时间戳质量检查失败: {quality_check['error']}",
+                "error_type": "quality_check_failed",
+                "quality_stats": quality_check["stats"]
+            }
+        
+        # 5. ✅ 生成高质量SRT字幕
+        logger.info(f"📊 质量统计: {quality_check['stats']}")
+        srt_content = to_srt(segments)
+        
+        # 6. 保存SRT文件
+        os.makedirs(os.path.dirname(output_srt_path), exist_ok=True)
+        with open(output_srt_path, 'w', encoding='utf-8') as f:
+            f.write(srt_content)
+        
+        logger.info(f"✅ 高质量SRT文件保存成功: {output_srt_path}")
+        
+        return {
+            "success": True,
+            "srt_path": output_srt_path,
+            "quality_stats": quality_check["stats"],
+            "quality_details": quality_check["details"],
+            "transcript_text": trans_result.get("transcript", "")
+        }
+    
+    async def _transcribe_video_async(self, video_path: str, output_srt_path: str,
+                                      preset_vocabulary_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        转录单个视频（异步）：在线程中提取音频，再上传识别，音频用完即删除
+        
+        参数和返回值与 transcribe_video_to_srt_with_details 相同。
+        """
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                # 1. 提取音频
+                audio_path = await asyncio.to_thread(self.extract_audio_from_video, video_path, temp_dir)
+                if not audio_path:
                     return {
                         "success": False,
-                        "quality_rejected": True,
-                        "error": f"时间戳质量检查失败: {quality_check['error']}",
-                        "error_type": "quality_check_failed",
-                        "quality_stats": quality_check["stats"]
+                        "error": "音频提取失败",
+                        "error_type": "audio_extraction_failed"
                     }
                 
-                # 5. ✅ 生成高质量SRT字幕
-                logger.info(f"📊 质量统计: {quality_check['stats']}")
-                srt_content = to_srt(segments)
-                
-                # 6. 保存SRT文件
-                os.makedirs(os.path.dirname(output_srt_path), exist_ok=True)
-                with open(output_srt_path, 'w', encoding='utf-8') as f:
-                    f.write(srt_content)
-                
-                logger.info(f"✅ 高质量SRT文件保存成功: {output_srt_path}")
-                
-                return {
-                    "success": True,
-                    "srt_path": output_srt_path,
-                    "quality_stats": quality_check["stats"],
-                    "quality_details": quality_check["details"],
-                    "transcript_text": trans_result.get("transcript", "")
-                }
-                
+                # 2. 转录音频 - 使用预设词汇表ID
+                logger.info(f"正在转录音频: {Path(video_path).name}")
+                trans_result = await self.analyzer.transcribe_audio_async(
+                    audio_path,
+                    preset_vocabulary_id=preset_vocabulary_id
+                )
+            
+            return self._save_srt_from_transcription(video_path, output_srt_path, trans_result)
+            
         except Exception as e:
             logger.error(f"转录视频失败 {video_path}: {e}")
             return {
@@ -389,6 +440,47 @@ class BatchVideoTranscriber:
                 "error_type": "processing_exception"
             }
     
+    def _transcribe_videos_concurrently(self, video_paths: List[str], output_srt_paths: List[str],
+                                        preset_vocabulary_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        批量转录多个视频：每个视频的音频提取、上传和识别作为一个任务并发执行
+        
+        同时进行的任务数不超过分析器的max_concurrency，一个视频提取音频时其他视频的上传和识别
+        同时进行，临时音频文件数量也不超过该上限。
+        
+        Args:
+            video_paths: 视频文件路径列表
+            output_srt_paths: 与video_paths对应的输出SRT文件路径
+            preset_vocabulary_id: 预设词汇表ID
+            
+        Returns:
+            与video_paths顺序一致的详细转录结果列表
+        """
+        async def run_all() -> List[Dict[str, Any]]:
+            semaphore = asyncio.Semaphore(self.analyzer.max_concurrency)
+            completed = 0
+            
+            async def guarded(video_path: str, output_srt_path: str) -> Dict[str, Any]:
+                nonlocal completed
+                async with semaphore:
+                    result = await self._transcribe_video_async(
+                        video_path, output_srt_path, preset_vocabulary_id
+                    )
+                completed += 1
+                status = "✅" if result.get("success") else "❌"
+                logger.info(f"处理进度: {completed}/{len(video_paths)} - {status} {Path(video_path).name}")
+                return result
+            
+            return await asyncio.gather(*(
+                guarded(video_path, output_srt_path)
+                for video_path, output_srt_path in zip(video_paths, output_srt_paths)
+            ))
+        
+        if not video_paths:
+            return []
+        logger.info(f"正在并发转录 {len(video_paths)} 个视频...")
+        return asyncio.run(run_all())
+    
     def batch_process(self, input_dir: str, output_dir: str, 
                      supported_formats: List[str] = None,
                      preset_vocabulary_id: Optional[str] = None) -> Dict[str, Any]:
@@ -448,10 +540,8 @@ class BatchVideoTranscriber:
             }
         }
         
-        for i, video_file in enumerate(video_files, 1):
-            logger.info(f"处理进度: {i}/{len(video_files)} - {video_file}")
-            
-            video_path = os.path.join(input_dir, video_file)
+        pending_files = []
+        for video_file in video_files:
             srt_filename = f"{Path(video_file).stem}.srt"
             output_srt_path = os.path.join(output_dir, srt_filename)
             
@@ -464,14 +554,18 @@ class BatchVideoTranscriber:
                     "srt_file": srt_filename,
                     "status": "已存在"
                 })
-                continue
-            
-            # 处理视频 - 使用预设词汇表ID
-            transcription_result = self.transcribe_video_to_srt_with_details(
-                video_path, 
-                output_srt_path,
-                preset_vocabulary_id=preset_vocabulary_id
-            )
+            else:
+                pending_files.append(video_file)
+        
+        # 处理视频 - 待处理视频并发提取音频和转录，使用预设词汇表ID
+        transcription_results = self._transcribe_videos_concurrently(
+            [os.path.join(input_dir, video_file) for video_file in pending_files],
+            [os.path.join(output_dir, f"{Path(video_file).stem}.srt") for video_file in pending_files],
+            preset_vocabulary_id=preset_vocabulary_id
+        )
+        
+        for video_file, transcription_result in zip(pending_files, transcription_results):
+            srt_filename = f"{Path(video_file).stem}.srt"
             
             if transcription_result["success"]:
                 results["success_count"] += 1
@@ -6,9 +6,16 @@ DashScope语音转录分析器
 
 import os
 import json
+import asyncio
+import difflib
+import hashlib
 import logging
+import mmap
+import re
+import tempfile
 import time
 from typing import Dict, Any, List, Optional, Union, Tuple
+from functools import lru_cache
 from pathlib import Path
 
 # 导入环境变量加载器
@@ -20,19 +27,152 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时回退到标准库json
+    orjson = None
+
+
+def _json_loads(data: bytes) -> Any:
+    """解析UTF-8 JSON字节（优先使用orjson）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _run_sync(coro, async_name: str):
+    """
+    在同步接口中运行协程并返回结果
+    
+    同步接口会阻塞调用线程直到完成；在运行中的事件循环里调用会卡住整个事件循环，
+    因此直接报错，提示改用对应的异步接口。
+    
+    Args:
+        coro: 要运行的协程
+        async_name: 对应的异步接口名称（用于错误提示）
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError(f"不能在运行中的事件循环里调用同步接口，请改用 await {async_name}(...)")
+
+
+@lru_cache(maxsize=256)
+def _file_sha256(path: str, mtime_ns: int, size: int) -> str:
+    """
+    计算文件SHA-256，按 (路径, 修改时间, 大小) 缓存
+    
+    通过只读mmap直接把页缓存交给hashlib，不为每个分块分配bytes对象；
+    读过的页留在页缓存中，随后的OSS上传读取同一文件时无需再访问磁盘。
+    """
+    digest = hashlib.sha256()
+    if size == 0:
+        return digest.hexdigest()
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        digest.update(mapped)
+    return digest.hexdigest()
+
+
+# 专业词汇正则校正规则 (从 transcribe_core.py 移植的精确规则)，模块加载时编译一次
+_REGEX_CORRECTIONS = tuple((re.compile(pattern), replacement) for pattern, replacement in [
+    # 启赋蕴淳A2专用规则
+    (r"启赋蕴淳\s*[Aa]2", "启赋蕴淳A2"),
+    (r"(起肤|启赋|其赋|启步|寄附|企付|气付)蕴(醇|春|淳|纯|存|纯新)\s*[Aa]2", "启赋蕴淳A2"),
+    (r"启赋\s+蕴(醇|春|淳|纯|存)\s*[Aa]2", "启赋蕴淳A2"),
+    
+    # 启赋蕴淳系列纠正
+    (r"(其|起|启|寄|企|气|七)(妇|赋|肤|步|腹|肚|服|赴|附|父|复|伏|夫|扶)(孕|蕴|运|韵|氲|芸|允|孕)(唇|春|淳|纯|醇|淙|椿|纯)(准|尊|遵)?", "启赋蕴淳"),
+    (r"(盲选)?(起|启|其|寄|企|气|七)?(腹|肚|服|赴|附|父|复|伏|夫|扶|妇|赋|肤|步)(孕|运|韵|氲|芸|允|孕|蕴)(唇|春|淳|纯|醇|淙|椿|纯)(准|尊|遵)?", "启赋蕴淳"),
+    (r"(起肤|启赋|其赋|启步|寄附|企付|气付)蕴(醇|春|淳|纯|存|纯新)", "启赋蕴淳"),
+    (r"启赋\s+蕴(醇|春|淳|纯|存)", "启赋蕴淳"),
+    (r"(起肤|启赋|其赋|启步|寄附|企付|气付)\s+蕴(醇|春|淳|纯|存)", "启赋蕴淳"),
+    (r"(起肤|启赋|其赋|启步|寄附|企付|气付)(韵|运|孕)(醇|春|淳|纯|存)", "启赋蕴淳"),
+    (r"(起|启|其).*(孕|蕴).*(准|淳|唇)", "启赋蕴淳"),
+    
+    # 低聚糖HMO系列纠正
+    (r"低聚糖\s*[Hh][Mm]?[Oo]?", "低聚糖HMO"),
+    (r"低聚糖\s*[Hh](\s|是|，|,|。|\.)", "低聚糖HMO$1"),
+    (r"低聚(塘|唐|煻)\s*[Hh][Mm]?[Oo]?", "低聚糖HMO"),
+    (r"低(祖|组|族)糖\s*[Hh][Mm]?[Oo]?", "低聚糖HMO"),
+    
+    # A2奶源系列纠正
+    (r"([Aa]|二|黑二|埃|爱|挨)奶源", "A2奶源"),
+    (r"[Aa]\s*2奶源", "A2奶源"),
+    (r"[Aa]二奶源", "A2奶源"),
+    (r"([Aa]|二|黑二|埃|爱|挨)(\s+)奶源", "A2奶源"),
+    
+    # OPN/OPG系列纠正
+    (r"欧盾", "OPN"),
+    (r"O-P-N", "OPN"),
+    (r"O\.P\.N", "OPN"),
+    (r"(欧|偶|鸥)(\s+)?(盾|顿|敦)", "OPN"),
+    (r"蛋白\s*[Oo]\s*[Pp]\s*[Nn]", "蛋白OPN"),
+    (r"蛋白\s*([Oo]|欧|偶)\s*([Pp]|盾|顿)\s*([Nn]|恩)", "蛋白OPN"),
+    (r"op[n]?王", "OPN"),
+    (r"op[g]?王", "OPN"),
+    
+    # 自御力/自愈力系列
+    (r"自(御|愈|育|渔|余|予|玉|预)力", "自愈力"),
+    (r"自(御|愈|育|渔|余|予|玉|预)(\s+)力", "自愈力"),
+])
+
+
+@lru_cache(maxsize=1)
+def _http_session():
+    """
+    进程内共享的requests会话：连接池复用到结果文件服务器的TCP/TLS连接
+    
+    批量转录时每次下载结果不再重新握手。
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# 结果格式无法识别时，依次尝试的可能包含文本的字段
+_TEXT_FIELDS = ('transcript', 'text', 'content', 'result')
+
+
+@lru_cache(maxsize=4096)
+def _closest_term(word: str, terms: Tuple[str, ...], cutoff: float) -> Optional[str]:
+    """返回与word最相似的专业词汇（相似度低于cutoff时返回None），同一词只比较一次"""
+    matches = difflib.get_close_matches(word, terms, n=1, cutoff=cutoff)
+    return matches[0] if matches else None
+
 
 class DashScopeAudioAnalyzer:
     """DashScope语音转录分析器"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, max_concurrency: int = 8,
+                 upload_threads: int = 2, use_cache: bool = False,
+                 cache_ttl_seconds: float = 7 * 24 * 3600):
         """
         初始化DashScope语音分析器
         
         Args:
             api_key: DashScope API密钥
+            max_concurrency: 批量转录时同时处理的音频文件数
+            upload_threads: 单个文件OSS分片上传的并发线程数（总上传线程数约为两者之积）
+            use_cache: 是否复用磁盘上的转录结果缓存（按音频内容哈希，默认False）
+            cache_ttl_seconds: 转录缓存的有效期（秒，默认7天）；缓存键只含热词表ID，
+                               服务端热词表内容变化后，旧结果最多被复用到过期为止
         """
         self.api_key = api_key or get_dashscope_api_key()
         self.base_url = "https://dashscope.aliyuncs.com"
+        self.max_concurrency = max(1, max_concurrency)
+        self.upload_threads = max(1, upload_threads)
+        self.use_cache = use_cache
+        self.cache_ttl_seconds = cache_ttl_seconds
+        # 按用户存放，不与其他用户共享系统临时目录
+        cache_root = os.environ.get("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache")
+        self.cache_dir = Path(cache_root) / "ai-video-master" / "dashscope_asr"
         
         if not self.api_key:
             logger.warning("未设置DASHSCOPE_API_KEY，DashScope语音分析器不可用")
@@ -62,10 +202,69 @@ class DashScopeAudioAnalyzer:
         language: str = "zh",
         format_result: bool = True,
         preset_vocabulary_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        转录音频文件 - 使用预设词汇表ID（同步接口）
+        
+        参数和返回值与 transcribe_audio_async 相同。
+        """
+        return _run_sync(self.transcribe_audio_async(
+            audio_path, language, format_result, preset_vocabulary_id
+        ), "transcribe_audio_async")
+    
+    def transcribe_many(
+        self,
+        audio_paths: List[str],
+        language: str = "zh",
+        preset_vocabulary_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        并发转录多个音频文件（同步接口）
+        
+        参数和返回值与 transcribe_many_async 相同。
+        """
+        return _run_sync(self.transcribe_many_async(audio_paths, language, preset_vocabulary_id),
+                         "transcribe_many_async")
+    
+    async def transcribe_many_async(
+        self,
+        audio_paths: List[str],
+        language: str = "zh",
+        preset_vocabulary_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        并发转录多个音频文件：一个文件等待识别结果时，其他文件的上传和识别同时进行
+        
+        Args:
+            audio_paths: 音频文件路径列表
+            language: 语言代码
+            preset_vocabulary_id: 预设词汇表ID
+            
+        Returns:
+            与audio_paths顺序一致的转录结果列表
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def guarded(audio_path: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.transcribe_audio_async(
+                    audio_path, language, preset_vocabulary_id=preset_vocabulary_id
+                )
+        
+        return await asyncio.gather(*(guarded(path) for path in audio_paths))
+    
+    async def transcribe_audio_async(
+        self,
+        audio_path: str,
+        language: str = "zh",
+        format_result: bool = True,
+        preset_vocabulary_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         转录音频文件 - 使用预设词汇表ID
         
+        上传在线程中执行，识别任务用异步轮询等待，多个文件可在同一事件循环中交错进行。
+        
         Args:
             audio_path: 音频文件路径
             language: 语言代码
@@ -93,8 +292,20 @@ class DashScopeAudioAnalyzer:
             }
         
         try:
+            # 使用预设词汇表ID（自动从.env获取默认值）
+            if not preset_vocabulary_id:
+                preset_vocabulary_id = get_default_vocab_id()
+            
+            # 相同音频内容 + 相同语言/热词表的转录结果直接复用
+            digest = await asyncio.to_thread(self._audio_digest, audio_path)
+            cache_key = self._transcript_cache_key(digest, language, preset_vocabulary_id)
+            cached = self._load_cached_transcript(cache_key)
+            if cached:
+                logger.info(f"♻️ 命中转录缓存，跳过上传和识别: {os.path.basename(audio_path)}")
+                return cached
+            
             # 1. 上传音频到OSS
-            oss_url = self._upload_audio_to_oss(audio_path)
+            oss_url = await asyncio.to_thread(self._upload_audio_to_oss, audio_path)
             if not oss_url:
                 return {
                     "success": False,
@@ -103,16 +314,14 @@ class DashScopeAudioAnalyzer:
                     "segments": []
                 }
             
-            # 2. 调用DashScope ASR API - 使用预设词汇表ID（自动从.env获取默认值）
-            if not preset_vocabulary_id:
-                preset_vocabulary_id = get_default_vocab_id()
-            
-            result = self._call_dashscope_asr(
+            # 2. 调用DashScope ASR API
+            result = await self._call_dashscope_asr_async(
                 oss_url=oss_url,
                 language=language,
                 preset_vocabulary_id=preset_vocabulary_id
             )
             
+            self._store_cached_transcript(cache_key, result)
             return result
                 
         except Exception as e:
@@ -124,6 +333,63 @@ class DashScopeAudioAnalyzer:
                 "segments": []
             }
     
+    def _audio_digest(self, audio_path: str) -> str:
+        """音频文件内容的SHA-256，文件未变化时不重复计算"""
+        st = os.stat(audio_path)
+        return _file_sha256(os.path.abspath(audio_path), st.st_mtime_ns, st.st_size)
+    
+    def _transcript_cache_key(self, digest: str, language: str,
+                              vocabulary_id: Optional[str]) -> Optional[str]:
+        """计算转录结果缓存键，禁用缓存时返回None"""
+        if not self.use_cache:
+            return None
+        raw = f"{digest}|{language}|{vocabulary_id or ''}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _load_cached_transcript(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """读取缓存的转录结果，未命中或已过期时返回None（过期文件顺带删除）"""
+        if not cache_key:
+            return None
+        
+        cache_file = self.cache_dir / f"{cache_key}.json"
+        try:
+            age = time.time() - cache_file.stat().st_mtime
+        except OSError:
+            return None
+        if age > self.cache_ttl_seconds:
+            cache_file.unlink(missing_ok=True)
+            return None
+        
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            cached["cache_hit"] = True
+            return cached
+        except Exception as e:
+            logger.warning(f"读取转录缓存失败 {cache_file}: {e}")
+            return None
+    
+    def _store_cached_transcript(self, cache_key: Optional[str], result: Dict[str, Any]):
+        """原子写入成功的转录结果（先写临时文件再替换）"""
+        if not cache_key or not result.get("success"):
+            return
+        
+        cache_file = self.cache_dir / f"{cache_key}.json"
+        tmp_name = None
+        
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # 每个写入方使用唯一的临时文件，并发写同一个键时互不覆盖
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir,
+                                             suffix='.tmp', delete=False) as f:
+                tmp_name = f.name
+                json.dump(result, f, ensure_ascii=False, default=str)
+            os.replace(tmp_name, cache_file)
+        except Exception as e:
+            logger.warning(f"写入转录缓存失败 {cache_file}: {e}")
+            if tmp_name:
+                Path(tmp_name).unlink(missing_ok=True)
+    
     def _upload_audio_to_oss(self, audio_path: str) -> Optional[str]:
         """
         上传音频文件到OSS，供DashScope API调用
@@ -137,8 +403,6 @@ class DashScopeAudioAnalyzer:
         try:
             # 🔧 直接使用 oss2 库上传
             import oss2
-            import uuid
-            import os
             
             # 从环境变量获取OSS配置
             access_key_id = os.environ.get("OSS_ACCESS_KEY_ID")
@@ -154,15 +418,25 @@ class DashScopeAudioAnalyzer:
             auth = oss2.Auth(access_key_id, access_key_secret)
             bucket = oss2.Bucket(auth, endpoint, bucket_name)
             
-            # 生成OSS对象名
+            # 按内容哈希生成确定的OSS对象名，同一音频只上传一次
             file_extension = os.path.splitext(audio_path)[1]
-            oss_filename = f"audio_transcription/{uuid.uuid4().hex}{file_extension}"
+            oss_filename = f"audio_transcription/sha256/{self._audio_digest(audio_path)}{file_extension}"
+            
+            if bucket.object_exists(oss_filename):
+                logger.info(f"📤 OSS已存在相同音频，跳过上传: {oss_filename}")
+                return bucket.sign_url('GET', oss_filename, 3600)
             
             logger.info(f"📤 正在上传 {audio_path} 到 OSS: {oss_filename}")
             
-            # 🔧 修复：使用正确的OSS上传方法
-            with open(audio_path, 'rb') as f:
-                bucket.put_object(oss_filename, f)
+            # 超过1MB时按1MB分片，多线程并发上传各分片；更小的文件走put_object_from_file单次上传
+            # 断点记录放在系统临时目录，不写入用户主目录
+            oss2.resumable_upload(
+                bucket, oss_filename, audio_path,
+                store=oss2.ResumableStore(root=tempfile.gettempdir()),
+                multipart_threshold=1024 * 1024,
+                part_size=1024 * 1024,
+                num_threads=self.upload_threads
+            )
             
             # 生成公网访问URL（临时URL，1小时有效）
             oss_url = bucket.sign_url('GET', oss_filename, 3600)
@@ -227,9 +501,8 @@ class DashScopeAudioAnalyzer:
             
             logger.info(f"📤 使用oss2库上传文件: {object_name}")
             
-            # 上传文件
-            with open(audio_path, 'rb') as f:
-                bucket.put_object(object_name, f)
+            # 上传文件（oss2按文件路径流式读取，不经Python层文件对象逐块拷贝）
+            bucket.put_object_from_file(object_name, audio_path)
             
             # 生成公网访问URL（临时URL，1小时有效）
             oss_url = bucket.sign_url('GET', object_name, 3600)
@@ -262,6 +535,41 @@ class DashScopeAudioAnalyzer:
         oss_url: str, 
         language: str = "zh",
         preset_vocabulary_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """调用DashScope ASR API（同步接口），参数和返回值与 _call_dashscope_asr_async 相同"""
+        return _run_sync(self._call_dashscope_asr_async(oss_url, language, preset_vocabulary_id),
+                         "_call_dashscope_asr_async")
+    
+    async def _wait_transcription_async(self, task_id: str):
+        """
+        异步轮询识别任务直到结束，代替阻塞线程的Transcription.wait
+        
+        轮询间隔从0.5秒开始按1.5倍递增，最长5秒。
+        
+        Args:
+            task_id: 识别任务ID
+            
+        Returns:
+            任务结束（或查询失败）时的Transcription.fetch响应
+        """
+        from dashscope.audio.asr import Transcription
+        from http import HTTPStatus
+        
+        delay = 0.5
+        while True:
+            response = await asyncio.to_thread(Transcription.fetch, task=task_id)
+            if response.status_code != HTTPStatus.OK:
+                return response
+            if response.output.task_status in ("SUCCEEDED", "FAILED", "CANCELED", "UNKNOWN"):
+                return response
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, 5.0)
+    
+    async def _call_dashscope_asr_async(
+        self, 
+        oss_url: str, 
+        language: str = "zh",
+        preset_vocabulary_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         调用DashScope ASR API进行语音识别（基于官方文档的paraformer-v2录音文件识别）
@@ -314,7 +622,7 @@ class DashScopeAudioAnalyzer:
             
             # 🔧 使用官方推荐的异步调用方式
             logger.info("📤 提交录音文件识别任务...")
-            task_response = Transcription.async_call(**params)
+            task_response = await asyncio.to_thread(Transcription.async_call, **params)
             
             # 验证任务提交结果
             if not task_response or not hasattr(task_response, 'output') or not task_response.output:
@@ -331,14 +639,15 @@ class DashScopeAudioAnalyzer:
             
             # 🔧 等待任务完成（官方推荐的轮询方式）
             logger.info("⏳ 等待识别任务完成...")
-            transcribe_response = Transcription.wait(task=task_id)
+            transcribe_response = await self._wait_transcription_async(task_id)
             
             # 检查响应状态
             if transcribe_response.status_code == HTTPStatus.OK:
                 logger.info("🎉 录音文件识别成功！开始解析结果...")
                 
                 # 解析识别结果
-                result = self._parse_dashscope_result(transcribe_response.output)
+                # 解析时会同步下载结果文件，放到线程中执行，不阻塞其他文件的上传和轮询
+                result = await asyncio.to_thread(self._parse_dashscope_result, transcribe_response.output)
                 
                 # 记录成功统计
                 if result.get("success"):
@@ -410,6 +719,8 @@ class DashScopeAudioAnalyzer:
         """
         解析DashScope ASR结果，支持多种响应格式
         
+        依次尝试 _RESULT_PARSERS 中的格式，第一个匹配且返回结果的格式即为最终结果。
+        
         Args:
             result: DashScope API响应结果 (可能是字典或TranscriptionOutput对象)
             
@@ -417,154 +728,21 @@ class DashScopeAudioAnalyzer:
             标准化的转录结果字典
         """
         try:
-            # 记录原始结果用于调试
-            logger.debug(f"正在解析DashScope结果类型: {type(result)}")
+            logger.debug("正在解析DashScope结果类型: %s", type(result))
             
-            full_text = ""
-            srt_content = ""
-            segments = []
-            
-            # 处理 TranscriptionOutput 对象
+            # 处理 TranscriptionOutput 对象：转换为字典以便统一处理
             if hasattr(result, '__dict__'):
-                # 转换为字典以便统一处理
                 try:
-                    # 安全地检查 results 属性
-                    results = getattr(result, 'results', None)
-                    if results is not None:
-                        result_dict = {'results': results}
-                        
-                        # 安全地添加其他可能的属性
-                        for attr in ['task_id', 'task_status', 'submit_time', 'scheduled_time', 'end_time', 'task_metrics', 'code', 'message']:
-                            try:
-                                value = getattr(result, attr, None)
-                                if value is not None:
-                                    result_dict[attr] = value
-                            except (KeyError, AttributeError) as e:
-                                # 忽略不存在的属性，避免 KeyError
-                                logger.debug(f"属性 {attr} 不存在或无法访问: {e}")
-                                continue
-                        
-                        logger.debug(f"转换TranscriptionOutput为字典: {list(result_dict.keys())}")
-                        result = result_dict
-                    else:
-                        # 如果没有 results 属性，尝试直接转换整个对象
-                        try:
-                            result = vars(result) if hasattr(result, '__dict__') else result
-                            logger.debug(f"直接转换对象属性: {list(result.keys()) if isinstance(result, dict) else type(result)}")
-                        except Exception as e:
-                            logger.warning(f"无法直接转换对象: {e}")
+                    result = self._output_to_dict(result)
                 except Exception as e:
                     logger.error(f"处理TranscriptionOutput对象时发生错误: {e}")
                     # 继续处理，可能是其他类型的对象
             
-            # 现在统一按字典格式处理
-            logger.debug(f"准备解析结果，类型: {type(result)}")
-            if isinstance(result, dict):
-                logger.debug(f"结果字段: {list(result.keys())}")
-                if 'results' in result:
-                    logger.debug(f"results字段存在，值: {result['results']}")
-                    logger.debug(f"results是否为真值: {bool(result['results'])}")
-            
-            # 格式1: DashScope录音文件识别 - 标准格式
-            if isinstance(result, dict) and 'results' in result and result['results']:
-                logger.debug(f"检测到DashScope results字段，task_status: {result.get('task_status', 'unknown')}")
-                
-                # 检查任务状态
-                task_status = result.get('task_status', '')
-                if task_status != 'SUCCEEDED':
-                    logger.warning(f"DashScope任务未成功完成，状态: {task_status}")
-                    return {
-                        "success": False,
-                        "error": f"DashScope任务状态: {task_status}",
-                        "transcript": "",
-                        "segments": [],
-                        "task_status": task_status
-                    }
-                
-                # 查找成功的子任务
-                results_list = result['results'] if isinstance(result['results'], list) else [result['results']]
-                for result_item in results_list:
-                    if not isinstance(result_item, dict):
-                        continue
-                        
-                    subtask_status = result_item.get('subtask_status', '')
-                    if subtask_status != 'SUCCEEDED':
-                        logger.debug(f"跳过失败的子任务，状态: {subtask_status}")
-                        continue
-                    
-                    transcription_url = result_item.get('transcription_url', '')
-                    if not transcription_url:
-                        logger.debug("子任务缺少transcription_url")
-                        continue
-                    
-                    logger.info(f"找到成功的转录结果URL: {transcription_url[:50]}...")
-                    
-                    # 下载并解析转录结果
-                    transcription_result = self._download_transcription_result(transcription_url)
-                    if transcription_result:
-                        return transcription_result
-                    else:
-                        logger.warning("转录结果下载失败，返回基本信息")
-                        return {
-                            "success": True,
-                            "transcript": "转录结果下载失败",
-                            "srt_content": "",
-                            "segments": [],
-                            "has_timestamps": False,
-                            "transcription_url": transcription_url,
-                            "note": "转录结果文件下载失败"
-                        }
-                
-                # 如果没有找到成功的子任务
-                logger.error("所有DashScope子任务都失败了")
-                return {
-                    "success": False,
-                    "error": "所有子任务都失败",
-                    "transcript": "",
-                    "segments": []
-                }
-            
-            # 格式3: 直接在顶级的text字段 (老版本)
-            if isinstance(result, dict) and 'text' in result:
-                full_text = result['text']
-                if full_text and full_text.strip():
-                    logger.warning("DashScope结果为旧版格式，缺少时间戳，只返回纯文本")
-                    return {
-                        "success": True,
-                        "transcript": full_text.strip(),
-                        "srt_content": "",
-                        "segments": [],
-                        "has_timestamps": False
-                    }
-            
-            # 格式4: 检查是否是空音频导致的空结果
-            if not result or (isinstance(result, dict) and not any(result.values())):
-                logger.warning("DashScope返回空结果，可能是音频无语音内容")
-                return {
-                    "success": True,
-                    "transcript": "",
-                    "srt_content": "",
-                    "segments": [],
-                    "has_timestamps": False,
-                    "note": "音频无语音内容或静音"
-                }
-            
-            # 格式5: 其他可能的格式尝试
-            if isinstance(result, dict):
-                # 尝试查找任何可能包含文本的字段
-                possible_text_fields = ['transcript', 'text', 'content', 'result']
-                for field in possible_text_fields:
-                    if field in result and result[field]:
-                        text_value = result[field]
-                        if isinstance(text_value, str) and text_value.strip():
-                            logger.warning(f"DashScope使用备用字段'{field}'解析文本")
-                            return {
-                                "success": True,
-                                "transcript": text_value.strip(),
-                                "srt_content": "",
-                                "segments": [],
-                                "has_timestamps": False
-                            }
+            for matches, parser in self._RESULT_PARSERS:
+                if matches(result):
+                    parsed = parser(self, result)
+                    if parsed is not None:
+                        return parsed
             
             # 所有格式都无法识别
             if isinstance(result, dict):
@@ -594,6 +772,128 @@ class DashScopeAudioAnalyzer:
                 "segments": [],
                 "exception_details": str(e)
             }
+    
+    def _output_to_dict(self, result):
+        """将TranscriptionOutput对象转换为字典（无results属性时直接取对象属性）"""
+        results = getattr(result, 'results', None)
+        if results is None:
+            return vars(result)
+        
+        result_dict = {'results': results}
+        for attr in ('task_id', 'task_status', 'submit_time', 'scheduled_time', 'end_time', 'task_metrics', 'code', 'message'):
+            try:
+                value = getattr(result, attr, None)
+            except (KeyError, AttributeError):
+                # 忽略不存在的属性，避免 KeyError
+                continue
+            if value is not None:
+                result_dict[attr] = value
+        return result_dict
+    
+    def _parse_results_format(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """格式1: DashScope录音文件识别 - 标准格式（results字段）"""
+        # 检查任务状态
+        task_status = result.get('task_status', '')
+        if task_status != 'SUCCEEDED':
+            logger.warning(f"DashScope任务未成功完成，状态: {task_status}")
+            return {
+                "success": False,
+                "error": f"DashScope任务状态: {task_status}",
+                "transcript": "",
+                "segments": [],
+                "task_status": task_status
+            }
+        
+        # 查找成功的子任务
+        results_list = result['results'] if isinstance(result['results'], list) else [result['results']]
+        for result_item in results_list:
+            if not isinstance(result_item, dict):
+                continue
+            
+            subtask_status = result_item.get('subtask_status', '')
+            if subtask_status != 'SUCCEEDED':
+                logger.debug("跳过失败的子任务，状态: %s", subtask_status)
+                continue
+            
+            transcription_url = result_item.get('transcription_url', '')
+            if not transcription_url:
+                logger.debug("子任务缺少transcription_url")
+                continue
+            
+            logger.info(f"找到成功的转录结果URL: {transcription_url[:50]}...")
+            
+            # 下载并解析转录结果
+            transcription_result = self._download_transcription_result(transcription_url)
+            if transcription_result:
+                return transcription_result
+            
+            logger.warning("转录结果下载失败，返回基本信息")
+            return {
+                "success": True,
+                "transcript": "转录结果下载失败",
+                "srt_content": "",
+                "segments": [],
+                "has_timestamps": False,
+                "transcription_url": transcription_url,
+                "note": "转录结果文件下载失败"
+            }
+        
+        # 如果没有找到成功的子任务
+        logger.error("所有DashScope子任务都失败了")
+        return {
+            "success": False,
+            "error": "所有子任务都失败",
+            "transcript": "",
+            "segments": []
+        }
+    
+    def _parse_text_format(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """格式2: 直接在顶级的text字段 (老版本)"""
+        logger.warning("DashScope结果为旧版格式，缺少时间戳，只返回纯文本")
+        return {
+            "success": True,
+            "transcript": result['text'].strip(),
+            "srt_content": "",
+            "segments": [],
+            "has_timestamps": False
+        }
+    
+    def _parse_empty_result(self, result) -> Dict[str, Any]:
+        """格式3: 空音频导致的空结果"""
+        logger.warning("DashScope返回空结果，可能是音频无语音内容")
+        return {
+            "success": True,
+            "transcript": "",
+            "srt_content": "",
+            "segments": [],
+            "has_timestamps": False,
+            "note": "音频无语音内容或静音"
+        }
+    
+    def _parse_fallback_fields(self, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """格式4: 在其他可能包含文本的字段中查找，找不到时返回None"""
+        field = next((field for field in _TEXT_FIELDS
+                      if isinstance(result.get(field), str) and result[field].strip()), None)
+        if field is None:
+            return None
+        
+        logger.warning(f"DashScope使用备用字段'{field}'解析文本")
+        return {
+            "success": True,
+            "transcript": result[field].strip(),
+            "srt_content": "",
+            "segments": [],
+            "has_timestamps": False
+        }
+    
+    # (匹配条件, 解析方法)，按顺序尝试
+    _RESULT_PARSERS = (
+        (lambda r: isinstance(r, dict) and bool(r.get('results')), _parse_results_format),
+        (lambda r: isinstance(r, dict) and isinstance(r.get('text'), str) and bool(r['text'].strip()),
+         _parse_text_format),
+        (lambda r: not r or (isinstance(r, dict) and not any(r.values())), _parse_empty_result),
+        (lambda r: isinstance(r, dict), _parse_fallback_fields),
+    )
 
     def _download_transcription_result(self, transcription_url: str) -> Optional[Dict[str, Any]]:
         """
@@ -611,65 +911,62 @@ class DashScopeAudioAnalyzer:
             logger.info(f"📥 开始下载转录结果: {transcription_url[:50]}...")
             
             # 下载JSON文件
-            response = requests.get(transcription_url, timeout=30)
+            response = _http_session().get(transcription_url, timeout=30)
             response.raise_for_status()
             
-            # 解析JSON内容
-            transcription_data = response.json()
+            # 直接解析响应字节，跳过requests的文本解码
+            transcription_data = _json_loads(response.content)
             logger.info(f"转录结果JSON结构: {list(transcription_data.keys())}")
             
-            # 输出完整的JSON数据以便调试
-            logger.info(f"完整转录结果: {transcription_data}")
+            # 完整JSON可达数MB，只在调试级别输出
+            logger.debug("完整转录结果: %s", transcription_data)
             
             # 按照官方文档格式解析
             if 'transcripts' not in transcription_data:
                 logger.error("转录结果格式错误：缺少transcripts字段")
                 return None
             
-            full_text = ""
-            srt_content = ""
-            segments = []
+            texts = []
+            timed = []  # (起始毫秒, 结束毫秒, 文本)
             
             for transcript in transcription_data['transcripts']:
-                if 'sentences' in transcript and transcript['sentences']:
-                    logger.info(f"处理转录包含 {len(transcript['sentences'])} 个句子")
-                    for i, sentence in enumerate(transcript['sentences'], 1):
-                        start_ms = sentence.get('begin_time', 0)
-                        end_ms = sentence.get('end_time', 0)
-                        text = sentence.get('text', '')
-                        
-                        logger.info(f"句子 {i}: 原始时间戳 start={start_ms} ({type(start_ms)}), end={end_ms} ({type(end_ms)})")
-                        logger.info(f"句子 {i}: 文本={text[:50]}...")
-                        
-                        # 确保时间戳是整数类型
-                        start_ms = int(float(start_ms)) if start_ms else 0
-                        end_ms = int(float(end_ms)) if end_ms else 0
-                        
-                        logger.info(f"句子 {i}: 转换后时间戳 start={start_ms}ms, end={end_ms}ms")
-                        
-                        if text and text.strip():
-                            full_text += text + " "
-                            start_time = self._format_timestamp(start_ms)
-                            end_time = self._format_timestamp(end_ms)
-                            logger.info(f"句子 {i}: 格式化时间戳 {start_time} --> {end_time}")
-                            srt_content += f"{i}\n{start_time} --> {end_time}\n{text}\n\n"
-                            
-                            segments.append({
-                                "start": start_ms / 1000.0,
-                                "end": end_ms / 1000.0,
-                                "text": text.strip()
-                            })
+                sentences = transcript.get('sentences')
+                if sentences:
+                    logger.info(f"处理转录包含 {len(sentences)} 个句子")
+                    # 确保时间戳是整数毫秒，跳过空文本句子
+                    kept = [
+                        (sentence, text) for sentence in sentences
+                        if (text := sentence.get('text') or '').strip()
+                    ]
+                    texts.extend(text for _, text in kept)
+                    timed.extend(
+                        (int(float(sentence.get('begin_time') or 0)),
+                         int(float(sentence.get('end_time') or 0)),
+                         text.strip())
+                        for sentence, text in kept
+                    )
                 
                 # 如果没有sentences，尝试使用text字段
                 elif 'text' in transcript:
-                    full_text = transcript['text']
+                    texts = [transcript['text']]
+            
+            # 一次性拼接文本和SRT，避免逐句字符串累加
+            full_text = " ".join(texts)
+            srt_content = "\n\n".join(
+                f"{i}\n{self._format_timestamp(start_ms)} --> {self._format_timestamp(end_ms)}\n{text}"
+                for i, (start_ms, end_ms, text) in enumerate(timed, 1)
+            )
+            segments = [
+                {"start": start_ms / 1000.0, "end": end_ms / 1000.0, "text": text}
+                for start_ms, end_ms, text in timed
+            ]
             
             if segments:
                 logger.info(f"✅ 成功解析转录结果: {len(segments)}个片段, {len(full_text.strip())}字符")
                 return {
                     "success": True,
                     "transcript": full_text.strip(),
-                    "srt_content": srt_content.strip(),
+                    "srt_content": srt_content,
                     "segments": segments,
                     "has_timestamps": True
                 }
@@ -955,60 +1252,13 @@ class DashScopeAudioAnalyzer:
         """
         应用正则表达式校正规则 (从 transcribe_core.py 移植的精确规则)
         """
-        import re
-        
-        corrections = [
-            # 启赋蕴淳A2专用规则
-            (r"启赋蕴淳\s*[Aa]2", "启赋蕴淳A2"),
-            (r"(起肤|启赋|其赋|启步|寄附|企付|气付)蕴(醇|春|淳|纯|存|纯新)\s*[Aa]2", "启赋蕴淳A2"),
-            (r"启赋\s+蕴(醇|春|淳|纯|存)\s*[Aa]2", "启赋蕴淳A2"),
-            
-            # 启赋蕴淳系列纠正
-            (r"(其|起|启|寄|企|气|七)(妇|赋|肤|步|腹|肚|服|赴|附|父|复|伏|夫|扶)(孕|蕴|运|韵|氲|芸|允|孕)(唇|春|淳|纯|醇|淙|椿|纯)(准|尊|遵)?", "启赋蕴淳"),
-            (r"(盲选)?(起|启|其|寄|企|气|七)?(腹|肚|服|赴|附|父|复|伏|夫|扶|妇|赋|肤|步)(孕|运|韵|氲|芸|允|孕|蕴)(唇|春|淳|纯|醇|淙|椿|纯)(准|尊|遵)?", "启赋蕴淳"),
-            (r"(起肤|启赋|其赋|启步|寄附|企付|气付)蕴(醇|春|淳|纯|存|纯新)", "启赋蕴淳"),
-            (r"启赋\s+蕴(醇|春|淳|纯|存)", "启赋蕴淳"),
-            (r"(起肤|启赋|其赋|启步|寄附|企付|气付)\s+蕴(醇|春|淳|纯|存)", "启赋蕴淳"),
-            (r"(起肤|启赋|其赋|启步|寄附|企付|气付)(韵|运|孕)(醇|春|淳|纯|存)", "启赋蕴淳"),
-            (r"(起|启|其).*(孕|蕴).*(准|淳|唇)", "启赋蕴淳"),
-            
-            # 低聚糖HMO系列纠正
-            (r"低聚糖\s*[Hh][Mm]?[Oo]?", "低聚糖HMO"),
-            (r"低聚糖\s*[Hh](\s|是|，|,|。|\.)", "低聚糖HMO$1"),
-            (r"低聚(塘|唐|煻)\s*[Hh][Mm]?[Oo]?", "低聚糖HMO"),
-            (r"低(祖|组|族)糖\s*[Hh][Mm]?[Oo]?", "低聚糖HMO"),
-            
-            # A2奶源系列纠正
-            (r"([Aa]|二|黑二|埃|爱|挨)奶源", "A2奶源"),
-            (r"[Aa]\s*2奶源", "A2奶源"),
-            (r"[Aa]二奶源", "A2奶源"),
-            (r"([Aa]|二|黑二|埃|爱|挨)(\s+)奶源", "A2奶源"),
-            
-            # OPN/OPG系列纠正
-            (r"欧盾", "OPN"),
-            (r"O-P-N", "OPN"),
-            (r"O\.P\.N", "OPN"),
-            (r"(欧|偶|鸥)(\s+)?(盾|顿|敦)", "OPN"),
-            (r"蛋白\s*[Oo]\s*[Pp]\s*[Nn]", "蛋白OPN"),
-            (r"蛋白\s*([Oo]|欧|偶)\s*([Pp]|盾|顿)\s*([Nn]|恩)", "蛋白OPN"),
-            (r"op[n]?王", "OPN"),
-            (r"op[g]?王", "OPN"),
-            
-            # 自御力/自愈力系列
-            (r"自(御|愈|育|渔|余|予|玉|预)力", "自愈力"),
-            (r"自(御|愈|育|渔|余|予|玉|预)(\s+)力", "自愈力"),
-        ]
-        
         # 应用所有校正规则
         corrected_text = text
-        for pattern, replacement in corrections:
+        for pattern, replacement in _REGEX_CORRECTIONS:
             try:
-                before_count = len(re.findall(pattern, corrected_text))
-                corrected_text = re.sub(pattern, replacement, corrected_text)
-                after_count = len(re.findall(replacement, corrected_text))
-                
-                if before_count > 0:
-                    logger.debug(f"正则矫正: {pattern} -> {replacement} (匹配 {before_count} 次)")
+                corrected_text, count = pattern.subn(replacement, corrected_text)
+                if count > 0:
+                    logger.debug("正则矫正: %s -> %s (匹配 %d 次)", pattern.pattern, replacement, count)
             except Exception as e:
                 logger.warning(f"正则表达式 {pattern} 执行失败: {str(e)}")
         
@@ -1024,23 +1274,21 @@ class DashScopeAudioAnalyzer:
         应用相似度匹配校正
         """
         try:
-            import difflib
-            
             corrected_text = text
-            words = text.split()
+            terms = tuple(professional_terms)
+            exact_terms = set(terms)
             
-            for i, word in enumerate(words):
-                # 找到最相似的专业词汇
-                matches = difflib.get_close_matches(
-                    word, professional_terms, 
-                    n=1, cutoff=similarity_threshold
-                )
+            for word in text.split():
+                # 本身就是专业词汇时无需比较相似度
+                if word in exact_terms:
+                    continue
                 
-                if matches and matches[0] != word:
+                # 找到最相似的专业词汇
+                corrected_word = _closest_term(word, terms, similarity_threshold)
+                if corrected_word and corrected_word != word:
                     # 替换为专业词汇
-                    corrected_word = matches[0]
                     corrected_text = corrected_text.replace(word, corrected_word, 1)
-                    logger.debug(f"相似度矫正: {word} -> {corrected_word}")
+                    logger.debug("相似度矫正: %s -> %s", word, corrected_word)
             
             return corrected_text
             
@@ -1389,8 +1637,8 @@ class DashScopeAudioAnalyzer:
             result = vocab_service.query_vocabulary(vocabulary_id=vocabulary_id)
             
             # 检查result的类型和结构
-            logger.debug(f"🔍 VocabularyService响应类型: {type(result)}")
-            logger.debug(f"🔍 VocabularyService响应内容: {result}")
+            logger.debug("🔍 VocabularyService响应类型: %s", type(result))
+            logger.debug("🔍 VocabularyService响应内容: %s", result)
             
             # 如果result是字典，直接使用
             if isinstance(result, dict):